@@ -9,8 +9,14 @@ of different collections in a similar fashion
 using a single iterator interface.
 """
 from __future__ import annotations
+import mmap
+import multiprocessing
+import os
+import tempfile
+from array import array
+from bisect import bisect_left, insort
 from collections.abc import Iterable, Iterator
-from typing import List, Any
+from typing import Callable, List, Any, Tuple
 
 
 """
@@ -54,43 +60,335 @@ class AlphabeticalOrderIterator(Iterator):
         return value
 
 
+class PartitionIterator(Iterator):
+    """
+    Walks the contiguous range [start, stop) of a collection, see
+    WordsCollection.partition. Partitions are independent: each one can be
+    consumed by another thread or process.
+    """
+
+    def __init__(self, collection: "WordsCollection", start: int, stop: int) -> None:
+        self._collection = collection
+        self._start = start
+        self._stop = stop
+        self._position = start
+
+    def __next__(self):
+        if self._position >= self._stop:
+            raise StopIteration()
+
+        value = self._collection[self._position]
+        self._position += 1
+        return value
+
+    def __reduce__(self):
+        """ Only the range is shipped to another process, not the whole collection """
+        _collection, _start, _stop = self._collection.get_range(self._position, self._stop)
+        return PartitionIterator, (_collection, _start, _stop)
+
+
 class WordsCollection(Iterable):
     """
     Concrete Collections provide one or several methods for retrieving fresh
     iterator instances, compatible with the collection class.
     """
 
-    def __init__(self, collection: List[Any] = []) -> None:
-        self._collection = collection
+    def __init__(self, collection: List[Any] = None) -> None:
+        self._collection = collection if collection is not None else []
 
     def __iter__(self) -> AlphabeticalOrderIterator:
         """
         The `__iter__()` method returns the iterator object itself, by default
         we return the iterator in ascending order.
         """
-        return AlphabeticalOrderIterator(self._collection)
+        return AlphabeticalOrderIterator(self)
+
+    def __getitem__(self, index: int) -> Any:
+        return self._collection[index]
+
+    def __len__(self) -> int:
+        return len(self._collection)
 
     def get_reverse_iterator(self) -> AlphabeticalOrderIterator:
-        return AlphabeticalOrderIterator(self._collection, True)
+        return AlphabeticalOrderIterator(self, True)
+
+    def partition(self, n: int) -> List[PartitionIterator]:
+        """ n independent iterators over disjoint contiguous ranges, in order """
+        if n < 1:
+            raise ValueError(f'cannot partition into {n} iterators, n must be at least 1')
+        _size, _remainder = divmod(len(self), n)
+        _partitions: List[PartitionIterator] = []
+        _start: int = 0
+        for i in range(n):
+            _stop: int = _start + _size + (1 if i < _remainder else 0)
+            _partitions.append(PartitionIterator(self, _start, _stop))
+            _start = _stop
+        return _partitions
+
+    def get_range(self, start: int, stop: int) -> Tuple["WordsCollection", int, int]:
+        """ A collection holding the range [start, stop), and the range inside it """
+        return WordsCollection(self._collection[start:stop]), 0, stop - start
 
     def add_item(self, item: Any) -> None:
         self._collection.append(item)
 
 
 
-# The client code may or may not know about the Concrete Iterator or
-# Collection classes, depending on the level of indirection you want to
-# keep in your program.
-collection = WordsCollection()
+class MmapWordsCollection(WordsCollection):
+    """
+    Read-only WordsCollection over a newline-delimited file, for word lists
+    larger than RAM.
+
+    The start offset of every line is indexed once into a sidecar
+    `<path>.idx` file (8 bytes per line, the last entry being the file
+    size). Both files are memory-mapped, so opening an already indexed
+    file is O(1) and a word is only decoded when it is accessed.
+    """
+
+    _INDEX_CHUNK: int = 1 << 16
+
+    def __init__(self, path: str, encoding: str = 'utf-8') -> None:
+        self._path = path
+        self._encoding = encoding
+        self._index_path = path + '.idx'
+
+        with open(path, 'rb') as _file:
+            _size: int = os.fstat(_file.fileno()).st_size
+            self._data = mmap.mmap(_file.fileno(), 0, access=mmap.ACCESS_READ) if _size else b''
+
+        if not self._is_index_fresh(_size):
+            self._build_index(_size)
+        with open(self._index_path, 'rb') as _file:
+            self._index = mmap.mmap(_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._offsets = memoryview(self._index).cast('Q')
+
+    def __getitem__(self, index: int) -> str:
+        _count: int = len(self._offsets) - 1
+        if index < 0:
+            index += _count
+        if not 0 <= index < _count:
+            raise IndexError('word index out of range')
+
+        _line: bytes = self._data[self._offsets[index]:self._offsets[index + 1]]
+        return _line.rstrip(b'\r\n').decode(self._encoding)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def add_item(self, item: Any) -> None:
+        raise TypeError('MmapWordsCollection is read-only')
+
+    def get_range(self, start: int, stop: int) -> Tuple["WordsCollection", int, int]:
+        # the file is shared, another process just maps it again
+        return self, start, stop
+
+    def __reduce__(self):
+        return MmapWordsCollection, (self._path, self._encoding)
+
+    def close(self) -> None:
+        self._offsets.release()
+        self._index.close()
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+    def _is_index_fresh(self, size: int) -> bool:
+        try:
+            _stat: os.stat_result = os.stat(self._index_path)
+        except FileNotFoundError:
+            return False
+        if _stat.st_size < 8 or _stat.st_mtime < os.stat(self._path).st_mtime:
+            return False
+
+        with open(self._index_path, 'rb') as _file:
+            _file.seek(-8, os.SEEK_END)
+            _last = array('Q')
+            _last.frombytes(_file.read(8))
+        return _last[0] == size
+
+    def _build_index(self, size: int) -> None:
+        """ Scans the file once and writes the offsets in chunks, so memory stays bounded """
+        _offsets = array('Q', [0])
+        with open(self._index_path, 'wb') as _file:
+            _position: int = 0
+            while True:
+                _newline: int = self._data.find(b'\n', _position) if size else -1
+                if _newline == -1 or _newline + 1 >= size:
+                    break
+                _position = _newline + 1
+                _offsets.append(_position)
+                if len(_offsets) >= self._INDEX_CHUNK:
+                    _offsets.tofile(_file)
+                    _offsets = array('Q')
+
+            if size:
+                _offsets.append(size)
+            _offsets.tofile(_file)
+
+
+
+class SortedWordsIterator(Iterator):
+    """
+    Walks a SortedWordsCollection in alphabetical (or reverse) order between
+    two positions. A position is a (block, index) pair.
+    """
+
+    def __init__(self, blocks: List[List[str]], start: Tuple[int, int], end: Tuple[int, int],
+                 reverse: bool = False) -> None:
+        self._blocks = blocks
+        self._start = start
+        self._end = end
+        self._reverse = reverse
+        self._block, self._index = end if reverse else start
+
+    def __next__(self) -> str:
+        if self._reverse:
+            while (self._block, self._index) > self._start:
+                if self._index > 0:
+                    self._index -= 1
+                    return self._blocks[self._block][self._index]
+                self._block -= 1
+                self._index = len(self._blocks[self._block])
+        else:
+            while (self._block, self._index) < self._end:
+                _block: List[str] = self._blocks[self._block]
+                if self._index < len(_block):
+                    self._index += 1
+                    return _block[self._index - 1]
+                self._block += 1
+                self._index = 0
+
+        raise StopIteration()
+
+
+class SortedWordsCollection(Iterable):
+    """
+    Collection that really keeps its words in alphabetical order.
+
+    Words are stored as a blocked sorted list: sorted blocks of at most
+    `2 * block_size` words plus the last word of every block. `add_item`
+    bisects the block maxima and then one block, so it costs O(log n)
+    comparisons and a block-sized move. Iterators are not valid any more
+    once the collection has changed.
+    """
+
+    def __init__(self, collection: List[str] = None, block_size: int = 512) -> None:
+        self._block_size = block_size
+        self._blocks: List[List[str]] = []
+        self._maxes: List[str] = []
+
+        for item in collection or []:
+            self.add_item(item)
+
+    def __len__(self) -> int:
+        return sum(len(block) for block in self._blocks)
+
+    def __iter__(self) -> SortedWordsIterator:
+        return SortedWordsIterator(self._blocks, (0, 0), (len(self._blocks), 0))
+
+    def get_reverse_iterator(self) -> SortedWordsIterator:
+        return SortedWordsIterator(self._blocks, (0, 0), (len(self._blocks), 0), True)
+
+    def iter_range(self, start: str, stop: str, reverse: bool = False) -> SortedWordsIterator:
+        """
+        Words `start <= word < stop` without scanning the whole collection:
+        iter_range('b', 'd') yields the words starting with 'b' or 'c'.
+        """
+        return SortedWordsIterator(self._blocks, self._locate(start), self._locate(stop), reverse)
+
+    def iter_prefix(self, prefix: str, reverse: bool = False) -> SortedWordsIterator:
+        return self.iter_range(prefix, prefix + chr(0x10ffff), reverse)
+
+    def add_item(self, item: str) -> None:
+        if not self._blocks:
+            self._blocks.append([item])
+            self._maxes.append(item)
+            return
+
+        _position: int = bisect_left(self._maxes, item)
+        if _position == len(self._maxes):
+            _position -= 1
+            self._blocks[_position].append(item)
+            self._maxes[_position] = item
+        else:
+            insort(self._blocks[_position], item)
+
+        _block: List[str] = self._blocks[_position]
+        if len(_block) > 2 * self._block_size:
+            self._blocks.insert(_position + 1, _block[self._block_size:])
+            del _block[self._block_size:]
+            self._maxes.insert(_position, _block[-1])
+
+    def _locate(self, item: str) -> Tuple[int, int]:
+        """ Position of the first word >= item """
+        _block: int = bisect_left(self._maxes, item)
+        if _block == len(self._maxes):
+            return len(self._blocks), 0
+        return _block, bisect_left(self._blocks[_block], item)
+
+
+
+def map_partitions(function: Callable[[Iterator], Any], collection: WordsCollection,
+                   partitions: int = None, processes: int = None) -> Iterator[Any]:
+    """
+    Calls `function` with every partition of the collection in a process
+    pool and yields the results in partition order. `function` must be
+    picklable, i.e. defined at module level.
+    """
+    _processes: int = processes or os.cpu_count() or 1
+    with multiprocessing.Pool(_processes) as _pool:
+        yield from _pool.imap(function, collection.partition(partitions or _processes))
+
+
+def count_letters(words: Iterator[str]) -> int:
+    return sum(len(word) for word in words)
+
+
+if __name__ == '__main__':
+    # The client code may or may not know about the Concrete Iterator or
+    # Collection classes, depending on the level of indirection you want to
+    # keep in your program.
+    collection = WordsCollection()
+
+    collection.add_item("First")
+    collection.add_item("Second")
+    collection.add_item("Third")
+
+    print("Straight traversal: ")
+    print('\n'.join(collection))
+
+    print('\n')
+
+    print("Reverse traversal: ")
+    print('\n'.join(collection.get_reverse_iterator()), end="")
+
+    print('\n')
+
+    # The sorted collection iterates in alphabetical order whatever the insertion order.
+    sorted_collection = SortedWordsCollection(["cherry", "banana", "date", "apple", "blueberry", "coconut"])
+
+    print("Alphabetical traversal: ")
+    print('\n'.join(sorted_collection))
+
+    print('\n')
+
+    print("Words from 'b' (included) to 'd' (excluded), in reverse: ")
+    print('\n'.join(sorted_collection.iter_range('b', 'd', reverse=True)))
+
+    print('\n')
 
-collection.add_item("First")
-collection.add_item("Second")
-collection.add_item("Third")
+    # Word lists larger than RAM are read through mmap, only the offsets index is built once.
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'words.txt')
+        with open(path, 'w') as words_file:
+            words_file.write('\n'.join(["First", "Second", "Third"]) + '\n')
 
-print("Straight traversal: ")
-print('\n'.join(collection))
+        mmap_collection = MmapWordsCollection(path)
+        print("Memory-mapped reverse traversal: ")
+        print('\n'.join(mmap_collection.get_reverse_iterator()))
+        mmap_collection.close()
 
-print('\n')
+    print('\n')
 
-print("Reverse traversal: ")
-print('\n'.join(collection.get_reverse_iterator()), end="")
+    # Partitions can be consumed in parallel, here one process per partition.
+    print("Letters per partition: ")
+    print(list(map_partitions(count_letters, collection, partitions=2)))
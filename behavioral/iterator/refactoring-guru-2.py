@@ -8,8 +8,24 @@ Thanks for the Iterator, clients go over elements
 of different collections in a similar fashion
 using a single iterator interface.
 """
-from time import sleep
-from typing import List, Dict
+import asyncio
+import csv
+import io
+import json
+import os
+import queue
+import sys
+import tempfile
+import tracemalloc
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import redirect_stdout
+from threading import Event, Lock, Thread
+from random import Random
+from time import monotonic, perf_counter, sleep
+from timeit import timeit
+from typing import Any, Awaitable, Callable, Deque, Iterable, Iterator, List, Dict, Tuple
 
 
 class ProfileIteratorInterface:
@@ -19,14 +35,20 @@ class ProfileIteratorInterface:
     def get_next(self) -> "Profile": raise NotImplementedError()
     def reset(self) -> None: raise NotImplementedError()
 
+    # the emails to go over and the profile of one of them, for consumers
+    # which resolve profiles themselves (see PipelinedSocialSpammer)
+    def get_emails(self) -> List[str]: raise NotImplementedError()
+    def fetch(self, email: str) -> "Profile": raise NotImplementedError()
+
 
 class FacebookIterator(ProfileIteratorInterface):
     """ Implements iteration over Facebook profiles """
 
-    def __init__(self, facebook: "Facebook", type_: str, email: str) -> None:
+    def __init__(self, facebook: "Facebook", type_: str, email: str, page_size: int = 1) -> None:
         self._facebook = facebook
         self._type = type_
         self._email = email
+        self._page_size = page_size
 
         self._current_position: int = 0
         self._emails: List[str] = []
@@ -51,7 +73,10 @@ class FacebookIterator(ProfileIteratorInterface):
         _friend_profile: Profile = self._profiles[self._current_position]
 
         if not _friend_profile:
-            _friend_profile = self._facebook.request_profile(_friend_email)
+            if self._page_size > 1:
+                _friend_profile = self.fetch_page()
+            else:
+                _friend_profile = self.fetch(_friend_email)
             self._profiles[self._current_position] = _friend_profile
 
         self._current_position += 1
@@ -60,14 +85,32 @@ class FacebookIterator(ProfileIteratorInterface):
     def reset(self) -> None:
         self._current_position = 0
 
+    def get_emails(self) -> List[str]:
+        self.lazy_load()
+        return self._emails
+
+    def fetch(self, email: str) -> "Profile":
+        return self._facebook.request_profile(email)
+
+    def fetch_page(self) -> "Profile":
+        """
+        Resolves the next `page_size` profiles in a single request and
+        returns the one at the current position.
+        """
+        _page_end: int = self._current_position + self._page_size
+        _page: List[Profile] = self._facebook.request_profiles(self._emails[self._current_position:_page_end])
+        self._profiles[self._current_position:self._current_position + len(_page)] = _page
+        return _page[0]
+
 
 class LinkedInIterator(ProfileIteratorInterface):
     """ Implements iteration over LinkedIn profiles """
 
-    def __init__(self, linkedin: "LinkedIn", type_: str, email: str) -> None:
+    def __init__(self, linkedin: "LinkedIn", type_: str, email: str, page_size: int = 1) -> None:
         self._linkedin = linkedin
         self._type = type_
         self._email = email
+        self._page_size = page_size
 
         self._current_position: int = 0
         self._emails: List[str] = []
@@ -92,7 +135,10 @@ class LinkedInIterator(ProfileIteratorInterface):
         _contact_profile = self._profiles[self._current_position]
 
         if not _contact_profile:
-            _contact_profile: Profile = self._linkedin.request_contact(_contact_email)
+            if self._page_size > 1:
+                _contact_profile: Profile = self.fetch_page()
+            else:
+                _contact_profile: Profile = self.fetch(_contact_email)
             self._profiles[self._current_position] = _contact_profile
 
         self._current_position += 1
@@ -101,22 +147,341 @@ class LinkedInIterator(ProfileIteratorInterface):
     def reset(self) -> None:
         self._current_position = 0
 
+    def get_emails(self) -> List[str]:
+        self.lazy_load()
+        return self._emails
+
+    def fetch(self, email: str) -> "Profile":
+        return self._linkedin.request_contact(email)
+
+    def fetch_page(self) -> "Profile":
+        """
+        Resolves the next `page_size` profiles in a single request and
+        returns the one at the current position.
+        """
+        _page_end: int = self._current_position + self._page_size
+        _page: List[Profile] = self._linkedin.request_profiles(self._emails[self._current_position:_page_end])
+        self._profiles[self._current_position:self._current_position + len(_page)] = _page
+        return _page[0]
+
+
+class PrefetchingProfileIterator(ProfileIteratorInterface):
+    """
+    Wraps a FacebookIterator or a LinkedInIterator and fetches the next
+    `read_ahead` profiles concurrently on a thread pool while the consumer
+    handles the current one. Iteration order is preserved, so a list of N
+    profiles takes about N / read_ahead network round trips instead of N.
+
+    Networks pass their shared thread pool; an iterator built without one
+    creates its own, which `close()` shuts down.
+    """
+
+    def __init__(self, iterator: ProfileIteratorInterface, read_ahead: int = 8,
+                 executor: ThreadPoolExecutor = None) -> None:
+        self._iterator = iterator
+        self._read_ahead = max(1, read_ahead)
+        self._owns_executor: bool = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=self._read_ahead)
+
+        self._current_position: int = 0
+        self._futures: Dict[int, Future] = {}
+        self._profiles: Dict[int, Profile] = {}
+
+    def has_next(self) -> bool:
+        return self._current_position < len(self._iterator.get_emails())
+
+    def get_next(self) -> "Profile":
+        if not self.has_next():
+            return None
+
+        self.prefetch()
+        if self._current_position not in self._profiles:
+            _future: Future = self._futures.pop(self._current_position)
+            self._profiles[self._current_position] = _future.result()
+
+        _profile: Profile = self._profiles[self._current_position]
+        self._current_position += 1
+        return _profile
+
+    def reset(self) -> None:
+        self._current_position = 0
+
+    def get_emails(self) -> List[str]:
+        return self._iterator.get_emails()
+
+    def fetch(self, email: str) -> "Profile":
+        return self._iterator.fetch(email)
+
+    def close(self) -> None:
+        if self._owns_executor:
+            self._executor.shutdown()
+
+    def prefetch(self) -> None:
+        """ Schedules the fetch of the current profile and the next ones """
+        _emails: List[str] = self._iterator.get_emails()
+        _last_position: int = min(self._current_position + self._read_ahead, len(_emails))
+        for _position in range(self._current_position, _last_position):
+            if _position not in self._profiles and _position not in self._futures:
+                self._futures[_position] = self._executor.submit(self._iterator.fetch, _emails[_position])
+
+
+class VisitedBitmap:
+    """
+    Compact visited set over integer profile ids: one bit per profile,
+    so a crawl of millions of profiles needs a few hundred kilobytes.
+    """
+
+    def __init__(self, size: int = 0) -> None:
+        self._bits = bytearray((size + 7) // 8)
+
+    def __contains__(self, profile_id: int) -> bool:
+        _byte: int = profile_id >> 3
+        return _byte < len(self._bits) and bool(self._bits[_byte] & (1 << (profile_id & 7)))
+
+    def add(self, profile_id: int) -> bool:
+        """ Marks the id as visited, returns False if it already was """
+        _byte: int = profile_id >> 3
+        if _byte >= len(self._bits):
+            self._bits.extend(bytes(max(_byte + 1, 2 * len(self._bits)) - len(self._bits)))
+
+        _mask: int = 1 << (profile_id & 7)
+        if self._bits[_byte] & _mask:
+            return False
+        self._bits[_byte] |= _mask
+        return True
+
+    def get_size_in_bytes(self) -> int:
+        return len(self._bits)
+
+
+class DepthArray:
+    """
+    Shortest depth reached so far per integer profile id, preallocated like
+    VisitedBitmap: one byte per profile when max_depth < 255, two below
+    65535, four otherwise.
+    """
+
+    def __init__(self, size: int, max_depth: int) -> None:
+        _typecode: str = 'B' if max_depth < 0xff else 'H' if max_depth < 0xffff else 'I'
+        self._unreached: int = (1 << (8 * array(_typecode).itemsize)) - 1
+        self._depths = array(_typecode, [self._unreached]) * size
+
+    def lower(self, profile_id: int, depth: int) -> bool:
+        """ Records the depth if it is shorter than the known one, returns whether it was """
+        if profile_id >= len(self._depths):
+            self._depths.extend(array(self._depths.typecode, [self._unreached]) * (profile_id + 1 - len(self._depths)))
+        if self._depths[profile_id] <= depth:
+            return False
+        self._depths[profile_id] = depth
+        return True
+
+    def get_size_in_bytes(self) -> int:
+        return self._depths.itemsize * len(self._depths)
+
+
+class ContactGraphIterator(ProfileIteratorInterface):
+    """
+    Streams the profiles up to `max_depth` hops away from a seed profile,
+    breadth-first (or depth-first), each profile at most once.
+
+    Contacts of every reached profile are walked with the network's
+    create_*_iterator factories and visited profiles are tracked in a
+    VisitedBitmap over the network's profile ids. Depth-first, a profile
+    may first be reached along a longer path: it is yielded then, with that
+    depth, and expanded again whenever a shorter path reaches it, so every
+    profile within `max_depth` hops is still found.
+    """
+
+    def __init__(self, network: "SocialNetworkInterface", email: str, contact_type: str = 'friends',
+                 max_depth: int = 2, depth_first: bool = False, read_ahead: int = 0) -> None:
+        self._network = network
+        self._email = email
+        self._contact_type = contact_type
+        self._max_depth = max_depth
+        self._depth_first = depth_first
+        self._read_ahead = read_ahead
+
+        # email -> profile of the whole walk, once get_emails has run it
+        self._reached: Dict[str, Profile] = None
+        self.reset()
+
+    def has_next(self) -> bool:
+        if self._next is None:
+            self._next = next(self._walk, None)
+        return self._next is not None
+
+    def get_next(self) -> "Profile":
+        if not self.has_next():
+            return None
+
+        _profile, self._current_depth = self._next
+        self._next = None
+        return _profile
+
+    def reset(self) -> None:
+        self._walk: Iterator[Tuple[Profile, int]] = self.walk()
+        self._next: Tuple[Profile, int] = None
+        self._current_depth: int = 0
+
+    def get_current_depth(self) -> int:
+        """ Number of hops between the seed and the last returned profile """
+        return self._current_depth
+
+    def get_emails(self) -> List[str]:
+        """ Emails of every profile the walk reaches, in walk order: runs a whole walk the first time """
+        if self._reached is None:
+            self._reached = {_profile.get_email(): _profile for _profile, _depth in self.walk()}
+        return list(self._reached)
+
+    def fetch(self, email: str) -> "Profile":
+        """ The walk already resolved the profiles """
+        self.get_emails()
+        return self._reached.get(email)
+
+    def walk(self) -> Iterator[Tuple["Profile", int]]:
+        _visited = VisitedBitmap(self._network.count_profiles())
+        _seed_id: int = self._network.get_profile_id(self._email)
+        if _seed_id is None:
+            return
+        _visited.add(_seed_id)
+        # depth-first only: shortest depth each profile was reached at so far
+        _depths: DepthArray = None
+        if self._depth_first:
+            _depths = DepthArray(self._network.count_profiles(), self._max_depth)
+            _depths.lower(_seed_id, 0)
+
+        _frontier: Deque[Tuple[str, int]] = deque([(self._email, 0)])
+        while _frontier:
+            _email, _depth = _frontier.pop() if self._depth_first else _frontier.popleft()
+            if _depth >= self._max_depth:
+                continue
+
+            _contacts: ProfileIteratorInterface = self.create_contacts_iterator(_email)
+            while _contacts.has_next():
+                _profile: Profile = _contacts.get_next()
+                if _profile is None:
+                    continue
+
+                _profile_id: int = self._network.get_profile_id(_profile.get_email())
+                if _profile_id is None:
+                    continue
+                if self._depth_first and not _depths.lower(_profile_id, _depth + 1):
+                    continue
+
+                if _visited.add(_profile_id):
+                    yield _profile, _depth + 1
+                elif not self._depth_first:
+                    continue
+                _frontier.append((_profile.get_email(), _depth + 1))
+
+    def create_contacts_iterator(self, email: str) -> ProfileIteratorInterface:
+        if self._contact_type == 'coworkers':
+            return self._network.create_coworkers_iterator(email, self._read_ahead)
+        return self._network.create_friends_iterator(email, self._read_ahead)
+
+
+class ProfileCache:
+    """
+    Network-level profile cache shared by every iterator created from the
+    same Facebook or LinkedIn instance. Entries expire after `ttl` seconds
+    and the least recently used one is evicted beyond `max_size` entries.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0, clock: Callable[[], float] = monotonic) -> None:
+        self._max_size = max_size
+        self._ttl = ttl
+        self._clock = clock
+        self._lock = Lock()
+
+        # email -> (expiration time, profile), least recently used first
+        self._entries: "OrderedDict[str, Tuple[float, Profile]]" = OrderedDict()
+        self._hits: int = 0
+        self._misses: int = 0
+
+    def get(self, email: str) -> "Profile":
+        with self._lock:
+            _entry: Tuple[float, Profile] = self._entries.get(email)
+            if _entry is None or _entry[0] <= self._clock():
+                if _entry is not None:
+                    del self._entries[email]
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(email)
+            self._hits += 1
+            return _entry[1]
+
+    def put(self, email: str, profile: "Profile") -> None:
+        if profile is None:
+            return
+
+        with self._lock:
+            self._entries[email] = (self._clock() + self._ttl, profile)
+            self._entries.move_to_end(email)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def get_hits(self) -> int:
+        return self._hits
+
+    def get_misses(self) -> int:
+        return self._misses
+
 
 class SocialNetworkInterface:
     """ Defines common social network interface """
 
-    def create_friends_iterator(self, profile_email: str) -> ProfileIteratorInterface: raise NotImplementedError()
-    def create_coworkers_iterator(self, profile_email: str) -> ProfileIteratorInterface: raise NotImplementedError()
+    # threads of the pool shared by the prefetching iterators of a network
+    _PREFETCH_WORKERS: int = 32
+    _prefetch_executor: ThreadPoolExecutor = None
+
+    def create_friends_iterator(self, profile_email: str, read_ahead: int = 0, page_size: int = 1) -> ProfileIteratorInterface: raise NotImplementedError()
+    def create_coworkers_iterator(self, profile_email: str, read_ahead: int = 0, page_size: int = 1) -> ProfileIteratorInterface: raise NotImplementedError()
+
+    def get_profile_id(self, profile_email: str) -> int: raise NotImplementedError()
+    def get_graph(self) -> "ContactGraph": raise NotImplementedError()
+    def count_profiles(self) -> int: raise NotImplementedError()
+
+    def create_contact_graph_iterator(self, profile_email: str, contact_type: str = 'friends', max_depth: int = 2,
+                                      depth_first: bool = False, read_ahead: int = 0) -> ProfileIteratorInterface:
+        return ContactGraphIterator(self, profile_email, contact_type, max_depth, depth_first, read_ahead)
+
+    def get_prefetch_executor(self) -> ThreadPoolExecutor:
+        """ One thread pool for every prefetching iterator of the network, created on first use """
+        if self._prefetch_executor is None:
+            self._prefetch_executor = ThreadPoolExecutor(max_workers=self._PREFETCH_WORKERS)
+        return self._prefetch_executor
+
+    def close(self) -> None:
+        """ Shuts down the prefetching thread pool, if any """
+        if self._prefetch_executor is not None:
+            self._prefetch_executor.shutdown()
+            self._prefetch_executor = None
+
+    def prefetching(self, iterator: ProfileIteratorInterface, read_ahead: int) -> ProfileIteratorInterface:
+        """ Wraps the iterator with a read-ahead of `read_ahead` profiles, if any """
+        if read_ahead > 0:
+            return PrefetchingProfileIterator(iterator, read_ahead, self.get_prefetch_executor())
+        return iterator
 
 
 class Facebook(SocialNetworkInterface):
 
-    def __init__(self, cache: List["Profile"]) -> None:
+    def __init__(self, cache: List["Profile"], latency: float = 2.5, profile_cache: ProfileCache = None,
+                 graph: "ContactGraph" = None) -> None:
         if cache:
             self._profiles: List[Profile] = cache
         else:
             self._profiles: List[Profile] = []
+        self._latency = latency
+        self._profile_cache = profile_cache or ProfileCache()
+
+        # contacts of the profiles added to this network
+        self._graph: ContactGraph = graph or ContactGraph()
 
+        # email -> position in self._profiles
+        self._index: Dict[str, int] = {}
+        self.rebuild_index()
 
     def request_profile(self, friend_email: str) -> "Profile":
         """
@@ -124,10 +489,35 @@ class Facebook(SocialNetworkInterface):
         Instead, we emulates long network connection, which you would expect
         in real life...
         """
+        _profile: Profile = self._profile_cache.get(friend_email)
+        if _profile:
+            return _profile
+
         self.simulate_network_latency()
         print(f'Facebook: Loading profile {friend_email} over the network...')
 
-        return self.find_profile(friend_email)
+        _profile = self.find_profile(friend_email)
+        self._profile_cache.put(friend_email, _profile)
+        return _profile
+
+    def request_profiles(self, friends_emails: List[str]) -> List["Profile"]:
+        """
+        Bulk version of `request_profile`: a whole page of profiles is
+        resolved in a single round trip.
+        """
+        _profiles: List[Profile] = [self._profile_cache.get(email) for email in friends_emails]
+        _missing: List[str] = [email for email, profile in zip(friends_emails, _profiles) if not profile]
+        if not _missing:
+            return _profiles
+
+        self.simulate_network_latency()
+        print(f'Facebook: Loading {len(_missing)} profiles over the network...')
+
+        _loaded: Dict[str, Profile] = {}
+        for email in _missing:
+            _loaded[email] = self.find_profile(email)
+            self._profile_cache.put(email, _loaded[email])
+        return [profile or _loaded[email] for email, profile in zip(friends_emails, _profiles)]
 
     def request_profile_email_friends(self, profile_email: str, contact_type: str) -> List[str]:
         """
@@ -144,28 +534,63 @@ class Facebook(SocialNetworkInterface):
         return None
 
     def find_profile(self, friend_email: str) -> "Profile":
-        for profile in self._profiles:
-            if profile.get_email() == friend_email:
-                return profile
-        return None
+        _position: int = self._index.get(friend_email)
+        if _position is None:
+            return None
+        return self._profiles[_position]
+
+    def add_profile(self, profile: "Profile") -> None:
+        profile.bind(self._graph)
+        self._profiles.append(profile)
+        self._index.setdefault(profile.get_email(), len(self._profiles) - 1)
+
+    def get_profile_cache(self) -> ProfileCache:
+        return self._profile_cache
+
+    def get_profile_id(self, profile_email: str) -> int:
+        """ Profiles are identified by their position in the network """
+        return self._index.get(profile_email)
+
+    def count_profiles(self) -> int:
+        return len(self._profiles)
+
+    def get_graph(self) -> "ContactGraph":
+        return self._graph
+
+    def rebuild_index(self) -> None:
+        """ Bulk path: reindexes every profile, e.g. after replacing the list """
+        self._index.clear()
+        for _position, _profile in enumerate(self._profiles):
+            _profile.bind(self._graph)
+            self._index.setdefault(_profile.get_email(), _position)
 
     def simulate_network_latency(self):
-        sleep(2.5)
+        sleep(self._latency)
 
-    def create_friends_iterator(self, profile_email: str) -> ProfileIteratorInterface:
-        return FacebookIterator(self, 'friends', profile_email)
+    def create_friends_iterator(self, profile_email: str, read_ahead: int = 0, page_size: int = 1) -> ProfileIteratorInterface:
+        return self.prefetching(FacebookIterator(self, 'friends', profile_email, page_size), read_ahead)
 
-    def create_coworkers_iterator(self, profile_email: str) -> ProfileIteratorInterface:
-        return FacebookIterator(self, 'coworkers', profile_email)
+    def create_coworkers_iterator(self, profile_email: str, read_ahead: int = 0, page_size: int = 1) -> ProfileIteratorInterface:
+        return self.prefetching(FacebookIterator(self, 'coworkers', profile_email, page_size), read_ahead)
 
 
 class LinkedIn(SocialNetworkInterface):
 
-    def __init__(self, cache: List["Profile"]) -> None:
+    def __init__(self, cache: List["Profile"], latency: float = 2.5, profile_cache: ProfileCache = None,
+                 graph: "ContactGraph" = None) -> None:
         if cache:
             self._contacts: List[Profile] = cache
         else:
             self._contacts: List[Profile] = []
+        self._latency = latency
+        self._profile_cache = profile_cache or ProfileCache()
+
+        # contacts of the profiles added to this network
+        self._graph: ContactGraph = graph or ContactGraph()
+
+        # email -> position in self._contacts
+        self._index: Dict[str, int] = {}
+        self.rebuild_index()
 
     def request_contact(self, contact_email: str) -> "Profile":
         """
@@ -173,10 +598,35 @@ class LinkedIn(SocialNetworkInterface):
         Instead, we emulates long network connection, which you would expect
         in the real life...
         """
+        _profile: Profile = self._profile_cache.get(contact_email)
+        if _profile:
+            return _profile
+
         self.simulate_network_latency()
         print(f'LinkedIn: Loading profile "{contact_email}" over the network...')
 
-        return self.find_contact(contact_email)
+        _profile = self.find_contact(contact_email)
+        self._profile_cache.put(contact_email, _profile)
+        return _profile
+
+    def request_profiles(self, contacts_emails: List[str]) -> List["Profile"]:
+        """
+        Bulk version of `request_contact`: a whole page of profiles is
+        resolved in a single round trip.
+        """
+        _profiles: List[Profile] = [self._profile_cache.get(email) for email in contacts_emails]
+        _missing: List[str] = [email for email, profile in zip(contacts_emails, _profiles) if not profile]
+        if not _missing:
+            return _profiles
+
+        self.simulate_network_latency()
+        print(f'LinkedIn: Loading {len(_missing)} profiles over the network...')
+
+        _loaded: Dict[str, Profile] = {}
+        for email in _missing:
+            _loaded[email] = self.find_contact(email)
+            self._profile_cache.put(email, _loaded[email])
+        return [profile or _loaded[email] for email, profile in zip(contacts_emails, _profiles)]
 
     def request_related_email_contacts(self, contact_email: str, contact_type: str) -> List[str]:
         """
@@ -193,52 +643,263 @@ class LinkedIn(SocialNetworkInterface):
         return None
 
     def find_contact(self, contact_email: str) -> "Profile":
-        for profile in self._contacts:
-            if profile.get_email() == contact_email:
-                return profile
-        return None
+        _position: int = self._index.get(contact_email)
+        if _position is None:
+            return None
+        return self._contacts[_position]
+
+    def add_profile(self, profile: "Profile") -> None:
+        profile.bind(self._graph)
+        self._contacts.append(profile)
+        self._index.setdefault(profile.get_email(), len(self._contacts) - 1)
+
+    def get_profile_cache(self) -> ProfileCache:
+        return self._profile_cache
+
+    def get_profile_id(self, profile_email: str) -> int:
+        """ Profiles are identified by their position in the network """
+        return self._index.get(profile_email)
+
+    def count_profiles(self) -> int:
+        return len(self._contacts)
+
+    def get_graph(self) -> "ContactGraph":
+        return self._graph
+
+    def rebuild_index(self) -> None:
+        """ Bulk path: reindexes every contact, e.g. after replacing the list """
+        self._index.clear()
+        for _position, _profile in enumerate(self._contacts):
+            _profile.bind(self._graph)
+            self._index.setdefault(_profile.get_email(), _position)
 
     def simulate_network_latency(self) -> None:
-        sleep(2.5)
+        sleep(self._latency)
 
-    def create_friends_iterator(self, profile_email: str) -> ProfileIteratorInterface:
-        return LinkedInIterator(self, 'friends', profile_email)
+    def create_friends_iterator(self, profile_email: str, read_ahead: int = 0, page_size: int = 1) -> ProfileIteratorInterface:
+        return self.prefetching(LinkedInIterator(self, 'friends', profile_email, page_size), read_ahead)
 
-    def create_coworkers_iterator(self, profile_email: str) -> ProfileIteratorInterface:
-        return LinkedInIterator(self, 'coworkers', profile_email)
+    def create_coworkers_iterator(self, profile_email: str, read_ahead: int = 0, page_size: int = 1) -> ProfileIteratorInterface:
+        return self.prefetching(LinkedInIterator(self, 'coworkers', profile_email, page_size), read_ahead)
 
 
-class Profile:
+class ContactGraph:
+    """
+    Compact store for the contacts of many profiles.
+
+    Emails are interned to integer ids and the contacts of each type are
+    kept as CSR (compressed sparse row): `offsets[id]:offsets[id + 1]` is
+    the slice of `targets` holding the contact ids of a profile, both in
+    `array` buffers. That is 4 bytes per edge (plus 8 per profile) instead
+    of a list slot and a string per contact, and scanning the contacts of
+    a profile reads contiguous memory.
+
+    New rows are kept in a pending table, which reads look at first, and
+    are merged into the CSR in batches that grow with the graph, so each
+    add costs amortized O(1) however adds and reads are interleaved.
+    Adding a profile again replaces its contacts.
+    """
+    _MIN_BATCH: int = 4096
 
-    def __init__(self, email: str, name: str, *contacts: str) -> None:
-        self._email = email
-        self._name = name
-        self._contacts: Dict[str, List[str]] = {}
+    def __init__(self) -> None:
+        self._ids: Dict[str, int] = {}
+        self._emails: List[str] = []
+        self._type_ids: Dict[str, int] = {}
+
+        # per contact type id: (offsets, targets)
+        self._rows: List[Tuple[array, array]] = []
+        self._merged_edges: int = 0
+
+        # rows added since the last merge: profile id -> type id -> contact ids
+        self._pending: Dict[int, Dict[int, array]] = {}
+        self._pending_edges: int = 0
+
+    def intern(self, email: str) -> int:
+        _id: int = self._ids.get(email)
+        if _id is None:
+            _id = self._ids[email] = len(self._emails)
+            self._emails.append(email)
+        return _id
+
+    def add_profile(self, email: str, contacts: Iterable[str]) -> int:
+        """ Stores the contacts, given as "type:email" or "email" (a friend), returns the profile id """
+        _id: int = self.intern(email)
+        _row: Dict[int, array] = {}
 
-        # Parse contact list from a set of "friend:email@gmail.com" pairs.
         for contact in contacts:
-            _parts: str = contact.split(':')
-            _contact_type: str = 'friends'
+            _contact_type, _contact_email = self.parse_contact(contact)
+            _type_id: int = self._type_ids.get(_contact_type)
+            if _type_id is None:
+                _type_id = self._type_ids[_contact_type] = len(self._rows)
+                self._rows.append((array('Q', [0]), array('I')))
+
+            _targets: array = _row.get(_type_id)
+            if _targets is None:
+                _targets = _row[_type_id] = array('I')
+            _targets.append(self.intern(_contact_email))
+
+        _replaced: Dict[int, array] = self._pending.get(_id)
+        if _replaced:
+            self._pending_edges -= sum(len(_targets) for _targets in _replaced.values())
+        self._pending[_id] = _row
+        self._pending_edges += sum(len(_targets) for _targets in _row.values())
+
+        # a merge costs O(profiles + edges), so batches grow with the graph
+        if len(self._pending) + self._pending_edges > max(self._MIN_BATCH, (len(self._emails) + self._merged_edges) // 4):
+            self.rebuild()
+        return _id
+
+    @staticmethod
+    def parse_contact(contact: str) -> Tuple[str, str]:
+        """ "type:email" or "email" (a friend) -> (type, email) """
+        _contact_type, _separator, _contact_email = contact.partition(':')
+        if not _separator:
+            return 'friends', _contact_type
+        return _contact_type, _contact_email
+
+    def get_email(self, profile_id: int) -> str:
+        return self._emails[profile_id]
+
+    def get_contact_ids(self, profile_id: int, contact_type: str) -> array:
+        _type_id: int = self._type_ids.get(contact_type)
+        if _type_id is None:
+            return array('I')
+
+        _row: Dict[int, array] = self._pending.get(profile_id)
+        if _row is not None:
+            return array('I', _row.get(_type_id, ()))
+
+        _offsets, _targets = self._rows[_type_id]
+        if profile_id + 1 >= len(_offsets):
+            return array('I')
+        return _targets[_offsets[profile_id]:_offsets[profile_id + 1]]
+
+    def get_contacts(self, profile_id: int, contact_type: str) -> List[str]:
+        return [self._emails[_id] for _id in self.get_contact_ids(profile_id, contact_type)]
+
+    def rebuild(self) -> None:
+        """ Merges the pending rows into the CSR of every contact type """
+        if not self._pending:
+            return
+
+        _count: int = len(self._emails)
+        for _type_id, (_offsets, _targets) in enumerate(self._rows):
+            _merged_rows: int = len(_offsets) - 1
+            _new_offsets = array('Q', [0])
+            _new_targets = array('I')
+            for _id in range(_count):
+                _row: Dict[int, array] = self._pending.get(_id)
+                if _row is not None:
+                    _new_targets.extend(_row.get(_type_id, ()))
+                elif _id < _merged_rows:
+                    _new_targets.extend(_targets[_offsets[_id]:_offsets[_id + 1]])
+                _new_offsets.append(len(_new_targets))
+
+            self._rows[_type_id] = (_new_offsets, _new_targets)
+
+        self._merged_edges = sum(len(_targets) for _offsets, _targets in self._rows)
+        self._pending = {}
+        self._pending_edges = 0
+
+    def count_edges(self) -> int:
+        self.rebuild()
+        return self._merged_edges
+
+    def get_size_in_bytes(self) -> int:
+        """ Size of the CSR buffers, interned emails excluded """
+        self.rebuild()
+        return sum(
+            _offsets.itemsize * len(_offsets) + _targets.itemsize * len(_targets)
+            for _offsets, _targets in self._rows
+        )
 
-            if len(_parts) == 1:
-                _contact_email = _parts[0]
-            else:
-                _contact_type = _parts[0]
-                _contact_email = _parts[1]
 
-            if _contact_type not in self._contacts:
-                self._contacts[_contact_type] = []
-            
-            self._contacts[_contact_type].append(_contact_email)
+class Profile:
+    """
+    Thin view over a profile stored in a ContactGraph. A profile created
+    without a graph keeps its own contacts until a network adds it, which
+    moves them into that network's graph.
+    """
+    __slots__ = ('_graph', '_id', '_name', '_email', '_contacts')
+
+    def __init__(self, email: str, name: str, *contacts: str, graph: ContactGraph = None) -> None:
+        self._graph: ContactGraph = None
+        self._id: int = -1
+        self._name = name
+
+        # Contact list as a set of "friend:email@gmail.com" pairs, parsed by the graph.
+        self._email: str = email
+        self._contacts: Tuple[str, ...] = contacts
+        if graph is not None:
+            self.bind(graph)
+
+    def bind(self, graph: ContactGraph) -> None:
+        """ Moves the contacts into `graph`; a profile already in a graph stays there """
+        if self._graph is not None:
+            return
+        self._id = graph.add_profile(self._email, self._contacts)
+        self._graph = graph
+        self._email = self._contacts = None
 
     def get_email(self) -> str:
-        return self._email
+        if self._graph is None:
+            return self._email
+        return self._graph.get_email(self._id)
 
     def get_contacts(self, contact_type: str) -> List[str]:
-        if contact_type not in self._contacts:
-            self._contacts[contact_type] = []
+        if self._graph is None:
+            return [
+                _email for _type, _email in map(ContactGraph.parse_contact, self._contacts) if _type == contact_type
+            ]
+        return self._graph.get_contacts(self._id, contact_type)
+
+
+class ProfileLoader:
+    """
+    Streams profiles from a JSONL or CSV export into a Facebook or LinkedIn
+    network, one row at a time. The network's email index is updated as
+    each profile is added and contacts go to the network's ContactGraph,
+    so no intermediate list of rows is ever built.
+
+    JSONL rows: {"email": "...", "name": "...", "contacts": ["friends:...", ...]}
+    CSV rows:   email,name,contacts   (contacts separated by ";")
+    """
 
-        return self._contacts[contact_type]
+    def __init__(self, network: SocialNetworkInterface, graph: ContactGraph = None) -> None:
+        self._network = network
+        self._graph = graph or network.get_graph()
+
+    def load(self, path: str) -> int:
+        """ Loads the file, prints and returns the number of rows loaded """
+        _started: float = perf_counter()
+        _rows: int = 0
+        for _email, _name, _contacts in self.read_rows(path):
+            self._network.add_profile(Profile(_email, _name, *_contacts, graph=self._graph))
+            _rows += 1
+        self._graph.rebuild()
+        _elapsed: float = perf_counter() - _started
+
+        print(f'ProfileLoader: {_rows} rows from {path} in {_elapsed:.2f}s ({_rows / max(_elapsed, 1e-9):,.0f} rows/s)')
+        return _rows
+
+    def read_rows(self, path: str) -> Iterator[Tuple[str, str, List[str]]]:
+        if path.endswith('.csv'):
+            return self.read_csv(path)
+        return self.read_jsonl(path)
+
+    def read_jsonl(self, path: str) -> Iterator[Tuple[str, str, List[str]]]:
+        with open(path, encoding='utf-8') as _file:
+            for _line in _file:
+                if not _line.strip():
+                    continue
+                _row: dict = json.loads(_line)
+                yield _row['email'], _row.get('name', ''), _row.get('contacts', [])
+
+    def read_csv(self, path: str) -> Iterator[Tuple[str, str, List[str]]]:
+        with open(path, encoding='utf-8', newline='') as _file:
+            for _row in csv.DictReader(_file):
+                _contacts: str = _row.get('contacts') or ''
+                yield _row['email'], _row.get('name', ''), [_contact for _contact in _contacts.split(';') if _contact]
 
 
 class SocialSpammer:
@@ -269,6 +930,289 @@ class SocialSpammer:
         print(f'Sent message to: {email}. Message body: {message}')
 
 
+class PipelinedSocialSpammer(SocialSpammer):
+    """
+    Message sending app as a two-stage pipeline: `fetch_workers` threads
+    resolve profiles and `send_workers` threads deliver messages, joined by
+    a queue of at most `queue_size` profiles. A slow send no longer stalls
+    profile fetching (until the queue is full) and a slow fetch no longer
+    stalls sending.
+
+    If a fetch or a send raises, both stages stop working but keep draining
+    their queues so every thread finishes, and `send_span` re-raises the
+    first error once they have all been joined.
+    """
+
+    _DONE: Any = object()
+
+    def __init__(self, network: SocialNetworkInterface, fetch_workers: int = 8, send_workers: int = 4,
+                 queue_size: int = 32, send_latency: float = 0.0) -> None:
+        super().__init__(network)
+        self._fetch_workers = fetch_workers
+        self._send_workers = send_workers
+        self._queue_size = queue_size
+        self._send_latency = send_latency
+        self._lock = Lock()
+        self._metrics: Dict[str, float] = {}
+        self._failed = Event()
+        self._errors: List[Exception] = []
+
+    def send_span_to_friends(self, profile_email: str, message: str) -> None:
+        print('\n Iterating over friends...\n')
+        self.send_span(self._network.create_friends_iterator(profile_email), message)
+
+    def send_span_to_coworkers(self, profile_email: str, message: str) -> None:
+        print('\n Iterating over coworkers...\n')
+        self.send_span(self._network.create_coworkers_iterator(profile_email), message)
+
+    def send_span(self, iterator: ProfileIteratorInterface, message: str) -> None:
+        self._profile_iterator = iterator
+        _emails: queue.Queue = queue.Queue()
+        for _email in iterator.get_emails():
+            _emails.put(_email)
+        _profiles: queue.Queue = queue.Queue(maxsize=self._queue_size)
+        self._metrics = {'sent': 0, 'depth_samples': 0, 'depth_total': 0, 'max_depth': 0}
+        self._failed.clear()
+        self._errors = []
+
+        _started: float = perf_counter()
+        _fetchers: List[Thread] = [
+            Thread(target=self.fetch_profiles, args=(iterator, _emails, _profiles)) for _ in range(self._fetch_workers)
+        ]
+        _senders: List[Thread] = [
+            Thread(target=self.send_messages, args=(_profiles, message)) for _ in range(self._send_workers)
+        ]
+        for _worker in _fetchers + _senders:
+            _worker.start()
+
+        for _fetcher in _fetchers:
+            _emails.put(self._DONE)
+        for _fetcher in _fetchers:
+            _fetcher.join()
+        for _sender in _senders:
+            _profiles.put(self._DONE)
+        for _sender in _senders:
+            _sender.join()
+
+        self._metrics['seconds'] = perf_counter() - _started
+        self._metrics['errors'] = len(self._errors)
+        if self._errors:
+            raise self._errors[0]
+
+    def fetch_profiles(self, iterator: ProfileIteratorInterface, emails: queue.Queue, profiles: queue.Queue) -> None:
+        """ First stage: resolves profiles, blocks while the queue is full """
+        while True:
+            _email: str = emails.get()
+            if _email is self._DONE:
+                return
+            if self._failed.is_set():
+                continue
+
+            try:
+                _profile: Profile = iterator.fetch(_email)
+            except Exception as error:
+                self.fail(error)
+                continue
+            if _profile:
+                profiles.put(_profile)
+                self.sample_queue_depth(profiles.qsize())
+
+    def send_messages(self, profiles: queue.Queue, message: str) -> None:
+        """ Second stage: delivers a message to every resolved profile """
+        while True:
+            _profile: Profile = profiles.get()
+            if _profile is self._DONE:
+                return
+            if self._failed.is_set():
+                continue
+
+            try:
+                self.send_message(_profile.get_email(), message)
+            except Exception as error:
+                self.fail(error)
+                continue
+            with self._lock:
+                self._metrics['sent'] += 1
+
+    def fail(self, error: Exception) -> None:
+        """ Records a worker error; from now on both stages only drain their queues """
+        with self._lock:
+            self._errors.append(error)
+        self._failed.set()
+
+    def send_message(self, email: str, message: str) -> None:
+        if self._send_latency:
+            sleep(self._send_latency)
+        super().send_message(email, message)
+
+    def sample_queue_depth(self, depth: int) -> None:
+        with self._lock:
+            self._metrics['depth_samples'] += 1
+            self._metrics['depth_total'] += depth
+            self._metrics['max_depth'] = max(self._metrics['max_depth'], depth)
+
+    def get_metrics(self) -> Dict[str, float]:
+        """ Throughput and queue depth of the last run """
+        _metrics: Dict[str, float] = dict(self._metrics)
+        _seconds: float = _metrics.get('seconds') or 1e-9
+        _metrics['messages_per_second'] = _metrics.get('sent', 0) / _seconds
+        _metrics['mean_depth'] = _metrics.get('depth_total', 0) / max(_metrics.get('depth_samples', 0), 1)
+        return _metrics
+
+    def report(self) -> None:
+        _metrics: Dict[str, float] = self.get_metrics()
+        print(f'PipelinedSocialSpammer: {_metrics["sent"]} messages in {_metrics["seconds"]:.2f}s '
+              f'({_metrics["messages_per_second"]:.0f}/s), queue depth mean {_metrics["mean_depth"]:.1f} '
+              f'max {_metrics["max_depth"]}')
+
+
+class AsyncProfileIterator:
+    """
+    asyncio counterpart of the profile iterators, used with `async for`.
+
+    Up to `read_ahead` profile requests of the list are in flight while the
+    consumer handles the current profile, profiles are still yielded in
+    order. The network's semaphore bounds the requests of all iterators.
+    """
+
+    def __init__(self, network: "AsyncSocialNetworkInterface", type_: str, email: str, read_ahead: int = 8) -> None:
+        self._network = network
+        self._type = type_
+        self._email = email
+        self._read_ahead = max(1, read_ahead)
+
+        self._emails: List[str] = None
+        self._scheduled: int = 0
+        self._pending: Deque[Awaitable[Profile]] = deque()
+
+    def __aiter__(self) -> "AsyncProfileIterator":
+        return self
+
+    async def __anext__(self) -> "Profile":
+        if self._emails is None:
+            self._emails = await self._network.request_emails(self._email, self._type) or []
+
+        while len(self._pending) < self._read_ahead and self._scheduled < len(self._emails):
+            _email: str = self._emails[self._scheduled]
+            self._pending.append(asyncio.ensure_future(self._network.request_profile(_email)))
+            self._scheduled += 1
+
+        if not self._pending:
+            raise StopAsyncIteration()
+        return await self._pending.popleft()
+
+
+class AsyncSocialNetworkInterface:
+    """
+    asyncio counterpart of SocialNetworkInterface. Network latency is
+    simulated with `asyncio.sleep` and at most `concurrency` requests run
+    at the same time.
+    """
+
+    def __init__(self, latency: float, concurrency: int) -> None:
+        self._latency = latency
+        self._concurrency = concurrency
+        self._semaphore: asyncio.Semaphore = None
+        self._semaphore_loop: asyncio.AbstractEventLoop = None
+
+    async def request_profile(self, email: str) -> "Profile": raise NotImplementedError()
+    async def request_emails(self, profile_email: str, contact_type: str) -> List[str]: raise NotImplementedError()
+
+    async def simulate_network_latency(self) -> None:
+        _loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        if self._semaphore_loop is not _loop:
+            # a semaphore is bound to one event loop: one per loop the network is used from
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+            self._semaphore_loop = _loop
+        async with self._semaphore:
+            await asyncio.sleep(self._latency)
+
+    def create_friends_iterator(self, profile_email: str, read_ahead: int = 8) -> AsyncProfileIterator:
+        return AsyncProfileIterator(self, 'friends', profile_email, read_ahead)
+
+    def create_coworkers_iterator(self, profile_email: str, read_ahead: int = 8) -> AsyncProfileIterator:
+        return AsyncProfileIterator(self, 'coworkers', profile_email, read_ahead)
+
+
+class AsyncFacebook(AsyncSocialNetworkInterface):
+    """ Facebook over asyncio, profiles are looked up in a wrapped Facebook """
+
+    def __init__(self, cache: List["Profile"], latency: float = 2.5, concurrency: int = 100) -> None:
+        super().__init__(latency, concurrency)
+        self._facebook = Facebook(cache, latency)
+
+    async def request_profile(self, friend_email: str) -> "Profile":
+        _profile: Profile = self._facebook.get_profile_cache().get(friend_email)
+        if _profile:
+            return _profile
+
+        await self.simulate_network_latency()
+        print(f'Facebook: Loading profile {friend_email} over the network...')
+
+        _profile = self._facebook.find_profile(friend_email)
+        self._facebook.get_profile_cache().put(friend_email, _profile)
+        return _profile
+
+    async def request_emails(self, profile_email: str, contact_type: str) -> List[str]:
+        await self.simulate_network_latency()
+        print(f'Facebook: Loading "{contact_type}" list of "{profile_email}" over the network...')
+
+        _profile: Profile = self._facebook.find_profile(profile_email)
+        if _profile:
+            return _profile.get_contacts(contact_type)
+        return None
+
+
+class AsyncLinkedIn(AsyncSocialNetworkInterface):
+    """ LinkedIn over asyncio, profiles are looked up in a wrapped LinkedIn """
+
+    def __init__(self, cache: List["Profile"], latency: float = 2.5, concurrency: int = 100) -> None:
+        super().__init__(latency, concurrency)
+        self._linkedin = LinkedIn(cache, latency)
+
+    async def request_profile(self, contact_email: str) -> "Profile":
+        _profile: Profile = self._linkedin.get_profile_cache().get(contact_email)
+        if _profile:
+            return _profile
+
+        await self.simulate_network_latency()
+        print(f'LinkedIn: Loading profile "{contact_email}" over the network...')
+
+        _profile = self._linkedin.find_contact(contact_email)
+        self._linkedin.get_profile_cache().put(contact_email, _profile)
+        return _profile
+
+    async def request_emails(self, contact_email: str, contact_type: str) -> List[str]:
+        await self.simulate_network_latency()
+        print(f'LinkedIn: Loading "{contact_type}" list of {contact_email} over the network...')
+
+        _profile: Profile = self._linkedin.find_contact(contact_email)
+        if _profile:
+            return _profile.get_contacts(contact_type)
+        return None
+
+
+class AsyncSocialSpammer:
+    """
+    Message sending app over asyncio. Many contact lists can be walked
+    concurrently by a single process, e.g. with `asyncio.gather`.
+    """
+
+    def __init__(self, network: AsyncSocialNetworkInterface) -> None:
+        self._network = network
+
+    async def send_span_to_friends(self, profile_email: str, message: str) -> None:
+        async for _profile in self._network.create_friends_iterator(profile_email):
+            self.send_message(_profile.get_email(), message)
+
+    async def send_span_to_coworkers(self, profile_email: str, message: str) -> None:
+        async for _profile in self._network.create_coworkers_iterator(profile_email):
+            self.send_message(_profile.get_email(), message)
+
+    def send_message(self, email: str, message: str) -> None:
+        print(f'Sent message to: {email}. Message body: {message}')
+
+
 class Demo:
     """ Demo class. Everything comes together here. """
     
@@ -335,5 +1279,199 @@ class Demo:
         return _profile_data
 
 
-demo: Demo = Demo()
-demo.run()
\ No newline at end of file
+class Benchmark:
+    """ Measures the iterators against a generated network with a short simulated latency """
+
+    def __init__(self, latency: float = 0.01) -> None:
+        self._latency = latency
+
+    def run(self) -> None:
+        self.read_ahead()
+        self.page_size()
+        self.lookup()
+        self.async_contact_lists()
+        self.shared_cache()
+        self.contact_graph()
+        self.contacts_memory()
+        self.bulk_load()
+        self.pipelined_spammer()
+
+    def create_profiles(self, count: int, contact_type: str = 'friends') -> List[Profile]:
+        """ A seed profile with `count` contacts, each of them with a profile of its own """
+        _emails: List[str] = [f'user{i}@example.com' for i in range(count)]
+        _profiles: List[Profile] = [
+            Profile('seed@example.com', 'Seed', *(f'{contact_type}:{email}' for email in _emails))
+        ]
+        _profiles.extend(Profile(email, email.split('@')[0], f'{contact_type}:seed@example.com') for email in _emails)
+        return _profiles
+
+    def iterate(self, iterator: ProfileIteratorInterface) -> float:
+        """ Seconds taken to walk the whole iterator, network logs are discarded """
+        _started: float = perf_counter()
+        with redirect_stdout(io.StringIO()):
+            while iterator.has_next():
+                iterator.get_next()
+        return perf_counter() - _started
+
+    def read_ahead(self, friends: int = 200) -> None:
+        print(f'Total simulated latency for {friends} friends ({self._latency * 1000:.0f} ms per round trip)')
+        for _read_ahead in (0, 8, 32):
+            _facebook = Facebook(self.create_profiles(friends), self._latency)
+            _elapsed: float = self.iterate(_facebook.create_friends_iterator('seed@example.com', read_ahead=_read_ahead))
+            _facebook.close()
+            print(f'  read-ahead {_read_ahead:>3}: {_elapsed:.2f}s')
+
+    def page_size(self, friends: int = 200) -> None:
+        print(f'Total simulated latency for {friends} friends ({self._latency * 1000:.0f} ms per round trip)')
+        for _page_size in (1, 10, 50, 200):
+            _facebook = Facebook(self.create_profiles(friends), self._latency)
+            _elapsed: float = self.iterate(_facebook.create_friends_iterator('seed@example.com', page_size=_page_size))
+            print(f'  page size {_page_size:>4}: {_elapsed:.2f}s')
+
+    def lookup(self) -> None:
+        print('Profile lookup by email, linear scan against the hash index')
+
+        def scan(profiles: List[Profile], email: str) -> Profile:
+            for profile in profiles:
+                if profile.get_email() == email:
+                    return profile
+            return None
+
+        for _size in (1_000, 10_000, 100_000, 1_000_000):
+            _graph = ContactGraph()
+            _profiles: List[Profile] = [Profile(f'user{i}@example.com', f'user{i}', graph=_graph) for i in range(_size)]
+            _facebook = Facebook(_profiles, self._latency)
+            _email: str = _profiles[-1].get_email()
+
+            _scan_us: float = timeit(lambda: scan(_profiles, _email), number=10) / 10 * 1e6
+            _index_us: float = timeit(lambda: _facebook.find_profile(_email), number=10_000) / 10_000 * 1e6
+            print(f'  {_size:>9} profiles: scan {_scan_us:>10.2f} us, index {_index_us:.3f} us')
+
+    def shared_cache(self, contacts: int = 100) -> None:
+        """ Friends and coworkers lists of the seed profile hold the same contacts """
+        _profiles: List[Profile] = self.create_profiles(contacts)
+        _profiles[0] = Profile('seed@example.com', 'Seed', *(
+            f'{contact_type}:user{i}@example.com' for contact_type in ('friends', 'coworkers') for i in range(contacts)
+        ))
+        _facebook = Facebook(_profiles, self._latency)
+        _elapsed: float = self.iterate(_facebook.create_friends_iterator('seed@example.com'))
+        _elapsed += self.iterate(_facebook.create_coworkers_iterator('seed@example.com'))
+
+        _cache: ProfileCache = _facebook.get_profile_cache()
+        print(f'Friends then coworkers sharing {contacts} contacts: {_elapsed:.2f}s, '
+              f'cache hits {_cache.get_hits()}, misses {_cache.get_misses()}')
+
+    def contact_graph(self, size: int = 100_000, max_depth: int = 6) -> None:
+        """ Crawls a random network where everybody has 5 friends """
+        _random = Random(42)
+        _profiles: List[Profile] = [
+            Profile(f'user{i}@example.com', f'user{i}', *(
+                f'friends:user{_random.randrange(size)}@example.com' for _ in range(5)
+            ))
+            for i in range(size)
+        ]
+        _facebook = Facebook(_profiles, latency=0)
+        _iterator = _facebook.create_contact_graph_iterator('user0@example.com', max_depth=max_depth)
+
+        _started: float = perf_counter()
+        _reached: int = 0
+        with redirect_stdout(io.StringIO()):
+            while _iterator.has_next():
+                _iterator.get_next()
+                _reached += 1
+        _elapsed: float = perf_counter() - _started
+        print(f'Friends up to {max_depth} hops away among {size} profiles: {_reached} reached in '
+              f'{_elapsed:.2f}s, visited bitmap of {VisitedBitmap(size).get_size_in_bytes()} bytes')
+
+    def contacts_memory(self, size: int = 50_000, contacts: int = 20) -> None:
+        """ Memory per edge of the contact graph against a dict of lists of emails """
+        _random = Random(42)
+        _rows: List[List[str]] = [
+            [f'friends:user{_random.randrange(size)}@example.com' for _ in range(contacts)] for i in range(size)
+        ]
+
+        tracemalloc.start()
+        _lists: Dict[str, Dict[str, List[str]]] = {}
+        for i, _row in enumerate(_rows):
+            _contacts: Dict[str, List[str]] = {}
+            for _contact in _row:
+                _contact_type, _contact_email = _contact.split(':')
+                _contacts.setdefault(_contact_type, []).append(_contact_email)
+            _lists[f'user{i}@example.com'] = _contacts
+        _lists_bytes: int = tracemalloc.get_traced_memory()[0]
+        del _lists
+
+        _before: int = tracemalloc.get_traced_memory()[0]
+        _graph = ContactGraph()
+        for i, _row in enumerate(_rows):
+            _graph.add_profile(f'user{i}@example.com', _row)
+        _graph.rebuild()
+        _graph_bytes: int = tracemalloc.get_traced_memory()[0] - _before
+        tracemalloc.stop()
+
+        _edges: int = size * contacts
+        print(f'Contacts of {size} profiles, {_edges} edges: dict of lists {_lists_bytes / _edges:.1f} bytes/edge, '
+              f'ContactGraph {_graph_bytes / _edges:.1f} bytes/edge '
+              f'({_graph.get_size_in_bytes() / _edges:.1f} in CSR buffers)')
+
+    def bulk_load(self, size: int = 100_000, contacts: int = 10) -> None:
+        """ Loads a generated JSONL export of `size` profiles and checks one lookup """
+        _random = Random(42)
+        with tempfile.TemporaryDirectory() as _directory:
+            _path: str = os.path.join(_directory, 'profiles.jsonl')
+            with open(_path, 'w', encoding='utf-8') as _file:
+                for i in range(size):
+                    _file.write(json.dumps({
+                        'email': f'user{i}@example.com',
+                        'name': f'user{i}',
+                        'contacts': [f'friends:user{_random.randrange(size)}@example.com' for _ in range(contacts)],
+                    }) + '\n')
+
+            _facebook = Facebook([], latency=0)
+            ProfileLoader(_facebook).load(_path)
+            assert len(_facebook.find_profile(f'user{size - 1}@example.com').get_contacts('friends')) == contacts
+
+    def pipelined_spammer(self, friends: int = 200) -> None:
+        """ Sequential spammer against the pipeline, sending also takes `latency` """
+        _latency: float = self._latency
+
+        class SlowSendSocialSpammer(SocialSpammer):
+            def send_message(self, email: str, message: str) -> None:
+                sleep(_latency)
+                super().send_message(email, message)
+
+        _facebook = Facebook(self.create_profiles(friends), self._latency)
+        _started: float = perf_counter()
+        with redirect_stdout(io.StringIO()):
+            SlowSendSocialSpammer(_facebook).send_span_to_friends('seed@example.com', 'Hey!')
+        print(f'Sequential spammer, {friends} friends: {perf_counter() - _started:.2f}s')
+
+        _facebook = Facebook(self.create_profiles(friends), self._latency)
+        _spammer = PipelinedSocialSpammer(_facebook, send_latency=_latency)
+        with redirect_stdout(io.StringIO()):
+            _spammer.send_span_to_friends('seed@example.com', 'Hey!')
+        _spammer.report()
+
+    def async_contact_lists(self, lists: int = 2000, concurrency: int = 200) -> None:
+        """ Walks the friends list of every generated profile concurrently """
+        _network = AsyncFacebook(self.create_profiles(lists), self._latency, concurrency)
+        _spammer = AsyncSocialSpammer(_network)
+
+        async def walk() -> None:
+            await asyncio.gather(*(
+                _spammer.send_span_to_friends(f'user{i}@example.com', 'Hey!') for i in range(lists)
+            ))
+
+        _started: float = perf_counter()
+        with redirect_stdout(io.StringIO()):
+            asyncio.run(walk())
+        _elapsed: float = perf_counter() - _started
+        print(f'Walked {lists} contact lists concurrently ({concurrency} requests in flight): {_elapsed:.2f}s')
+
+
+if __name__ == '__main__':
+    if 'benchmark' in sys.argv[1:]:
+        Benchmark().run()
+    else:
+        demo: Demo = Demo()
+        demo.run()
\ No newline at end of file
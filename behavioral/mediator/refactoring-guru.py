@@ -8,6 +8,23 @@ The Mediator makes it easy to modify, extend
 and reuse individual components because they're
 no longer dependent on the dozens of other classes.
 """
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+from array import array
+from collections import deque
+from multiprocessing.connection import Connection, wait
+from random import Random
+from time import monotonic_ns, perf_counter, perf_counter_ns
+from timeit import timeit
+from typing import Callable, Deque, Dict, Iterator, List, Tuple
+
+
+# reaction(sender, count): count is the number of notifications the call
+# stands for, always 1 unless a QueuedMediator coalesced several of them
+Reaction = Callable[[object, int], None]
 
 
 class MediatorInterface:
@@ -18,9 +35,112 @@ class MediatorInterface:
     components.
     """
 
+    # methods recorded by enable_tracing, all called as method(sender, event, ...)
+    _traced_methods: Tuple[str, ...] = ('notify',)
+
     def notify(self, sender: object, event: str) -> None:
         raise NotImplementedError()
 
+    def enable_tracing(self, buffer: 'TraceBuffer') -> None:
+        """
+        Records every notification into the buffer. The traced methods are
+        set on the instance, shadowing the class methods, so a mediator
+        without tracing runs exactly the untraced code.
+        """
+        for _name in self._traced_methods:
+            setattr(self, _name, self._trace(_name, getattr(type(self), _name), buffer))
+
+    def _trace(self, kind: str, method: Callable[..., None], buffer: 'TraceBuffer') -> Callable[..., None]:
+        def traced(sender: object, event: str, *args: object) -> None:
+            _record: int = buffer.begin(sender, event, kind)
+            try:
+                method(self, sender, event, *args)
+            finally:
+                buffer.end(_record)
+
+        return traced
+
+    def disable_tracing(self) -> None:
+        for _name in self._traced_methods:
+            self.__dict__.pop(_name, None)
+
+
+class TraceBuffer:
+    """
+    Ring buffer of the last `capacity` notifications: sender type, event,
+    monotonic start time and duration in ns, cascade depth and kind (the
+    traced method, e.g. `notify` or `react`), stored in preallocated arrays
+    (senders, events and kinds are interned to integers).
+    """
+
+    def __init__(self, capacity: int = 65536) -> None:
+        self._capacity = capacity
+        self._senders = array('I', bytes(4 * capacity))
+        self._events = array('I', bytes(4 * capacity))
+        self._timestamps = array('q', bytes(8 * capacity))
+        self._durations = array('q', bytes(8 * capacity))
+        self._depths = array('H', bytes(2 * capacity))
+        self._kinds = array('B', bytes(capacity))
+
+        self._count: int = 0
+        self._depth: int = 0
+        self._sender_ids: Dict[type, int] = {}
+        self._event_ids: Dict[str, int] = {}
+        self._kind_ids: Dict[str, int] = {}
+
+    def begin(self, sender: object, event: str, kind: str = 'notify') -> int:
+        """ Records the start of a notification, returns its record number for `end` """
+        _record: int = self._count
+        _slot: int = _record % self._capacity
+        self._count += 1
+        self._depth += 1
+
+        _sender_type: type = type(sender)
+        _sender_id: int = self._sender_ids.get(_sender_type)
+        if _sender_id is None:
+            _sender_id = self._sender_ids[_sender_type] = len(self._sender_ids)
+        _event_id: int = self._event_ids.get(event)
+        if _event_id is None:
+            _event_id = self._event_ids[event] = len(self._event_ids)
+        _kind_id: int = self._kind_ids.get(kind)
+        if _kind_id is None:
+            _kind_id = self._kind_ids[kind] = len(self._kind_ids)
+
+        self._senders[_slot] = _sender_id
+        self._events[_slot] = _event_id
+        self._depths[_slot] = min(self._depth, 0xffff)
+        self._kinds[_slot] = _kind_id
+        self._timestamps[_slot] = monotonic_ns()
+        return _record
+
+    def end(self, record: int) -> None:
+        # a notification spanning more than `capacity` inner ones lost its slot
+        if self._count - record <= self._capacity:
+            _slot: int = record % self._capacity
+            self._durations[_slot] = monotonic_ns() - self._timestamps[_slot]
+        self._depth -= 1
+
+    def __len__(self) -> int:
+        return min(self._count, self._capacity)
+
+    def records(self) -> Iterator[Tuple[int, int, int, str, str, str]]:
+        """ (timestamp ns, duration ns, depth, kind, sender, event), oldest first """
+        _senders: List[str] = [_type.__name__ for _type in self._sender_ids]
+        _events: List[str] = list(self._event_ids)
+        _kinds: List[str] = list(self._kind_ids)
+        _first: int = max(self._count - self._capacity, 0)
+        for _number in range(_first, self._count):
+            _slot: int = _number % self._capacity
+            yield (self._timestamps[_slot], self._durations[_slot], self._depths[_slot], _kinds[self._kinds[_slot]],
+                   _senders[self._senders[_slot]], _events[self._events[_slot]])
+
+    def dump(self, path: str) -> None:
+        """ Writes the records as tab-separated values, for offline analysis """
+        with open(path, 'w') as _file:
+            _file.write('timestamp_ns\tduration_ns\tdepth\tkind\tsender\tevent\n')
+            for _record in self.records():
+                _file.write('\t'.join(map(str, _record)) + '\n')
+
 
 class ConcreteMediator(MediatorInterface):
 
@@ -41,6 +161,305 @@ class ConcreteMediator(MediatorInterface):
             self._component_2.do_c()
 
 
+class RegistryMediator(MediatorInterface):
+    """
+    Mediator whose reactions are registered per (sender type, event)
+    instead of being hardcoded in an if/elif chain: `notify` dispatches
+    with a single dict lookup, whatever the number of events, and new
+    reactions don't require editing the mediator.
+
+    Reactions registered for a base class also apply to its subclasses.
+    They are called as `reaction(sender, count)` (see Reaction).
+    """
+
+    def __init__(self, *components: 'BaseComponent') -> None:
+        self._reactions: Dict[Tuple[type, str], List[Reaction]] = {}
+
+        # (sender type, event) -> reactions, including the inherited ones
+        self._dispatch: Dict[Tuple[type, str], Tuple[Reaction, ...]] = {}
+
+        for _component in components:
+            _component.set_mediator(self)
+
+    def register(self, sender_type: type, event: str, reaction: Reaction) -> None:
+        self._reactions.setdefault((sender_type, event), []).append(reaction)
+        self._dispatch.clear()
+
+    def notify(self, sender: object, event: str) -> None:
+        for _reaction in self.get_reactions(type(sender), event):
+            _reaction(sender, 1)
+
+    def get_reactions(self, sender_type: type, event: str) -> Tuple[Reaction, ...]:
+        _key: Tuple[type, str] = (sender_type, event)
+        _reactions: Tuple[Reaction, ...] = self._dispatch.get(_key)
+        if _reactions is None:
+            _reactions = self._dispatch[_key] = tuple(
+                _reaction
+                for _type in sender_type.__mro__
+                for _reaction in self._reactions.get((_type, event), ())
+            )
+        return _reactions
+
+
+class ConcreteRegistryMediator(RegistryMediator):
+    """ Same reactions as ConcreteMediator, registered instead of hardcoded """
+
+    def __init__(self, component_1: 'Component1', component_2: 'Component2') -> None:
+        super().__init__(component_1, component_2)
+        self._component_1 = component_1
+        self._component_2 = component_2
+
+        self.register(Component1, 'A', self.react_on_a)
+        self.register(Component2, 'D', self.react_on_d)
+
+    def react_on_a(self, sender: object, count: int) -> None:
+        print('Mediator reacts on A and triggers following operations:')
+        self._component_2.do_c()
+
+    def react_on_d(self, sender: object, count: int) -> None:
+        print('Mediator reacts on D and triggers following operations:')
+        self._component_1.do_b()
+        self._component_2.do_c()
+
+
+class QueuedMediator(RegistryMediator):
+    """
+    Mediator mode in which `notify` only enqueues the event and returns.
+    Reactions run later, from `drain()` or from the asyncio `run()` loop,
+    in batches: a reaction that notifies again just enqueues another event,
+    so cascades become a sequence of bounded-depth steps instead of a deep
+    recursion on the caller's stack.
+
+    With a `coalesce_window` (in seconds), identical (sender, event)
+    notifications queued within the window of the first one are merged
+    into a single reaction call, whose `count` is the number merged.
+
+    Tracing records both the enqueueing `notify` and the `react` which
+    later dispatches the event, so the duration of a cascade step and the
+    notifications it queues (one level deeper) are visible.
+    """
+    _traced_methods: Tuple[str, ...] = ('notify', 'react')
+
+    def __init__(self, *components: 'BaseComponent', coalesce_window: float = None) -> None:
+        # [sender, event, enqueue time in ns, coalesced notifications]
+        self._queue: Deque[list] = deque()
+        self._running: bool = False
+        self._metrics: Dict[str, int] = {
+            'dispatched': 0, 'coalesced': 0, 'max_depth': 0, 'total_latency_ns': 0, 'max_latency_ns': 0
+        }
+
+        self._coalesce_window_ns: int = None if coalesce_window is None else int(coalesce_window * 1e9)
+        # (sender id, event) -> its queued entry, while it can still absorb notifications
+        self._coalescing: Dict[Tuple[int, str], list] = {}
+        super().__init__(*components)
+
+    def notify(self, sender: object, event: str) -> None:
+        _now_ns: int = perf_counter_ns()
+        if self._coalesce_window_ns is not None:
+            _key: Tuple[int, str] = (id(sender), event)
+            _entry: list = self._coalescing.get(_key)
+            if _entry is not None and _now_ns - _entry[2] <= self._coalesce_window_ns:
+                _entry[3] += 1
+                self._metrics['coalesced'] += 1
+                return
+            _entry = self._coalescing[_key] = [sender, event, _now_ns, 1]
+        else:
+            _entry = [sender, event, _now_ns, 1]
+
+        self._queue.append(_entry)
+        if len(self._queue) > self._metrics['max_depth']:
+            self._metrics['max_depth'] = len(self._queue)
+
+    def dispatch_batch(self, batch_size: int = 64) -> int:
+        """ Runs the reactions of up to `batch_size` queued events, returns how many """
+        _dispatched: int = 0
+        while self._queue and _dispatched < batch_size:
+            _entry: list = self._queue.popleft()
+            _sender, _event, _enqueued_ns, _count = _entry
+            _latency_ns: int = perf_counter_ns() - _enqueued_ns
+            self._metrics['total_latency_ns'] += _latency_ns
+            self._metrics['max_latency_ns'] = max(self._metrics['max_latency_ns'], _latency_ns)
+
+            if self._coalesce_window_ns is not None:
+                _key: Tuple[int, str] = (id(_sender), _event)
+                if self._coalescing.get(_key) is _entry:
+                    del self._coalescing[_key]
+            self.react(_sender, _event, _count)
+            _dispatched += 1
+
+        self._metrics['dispatched'] += _dispatched
+        return _dispatched
+
+    def react(self, sender: object, event: str, count: int) -> None:
+        """ Runs the reactions of a dequeued event """
+        for _reaction in self.get_reactions(type(sender), event):
+            _reaction(sender, count)
+
+    def drain(self, batch_size: int = 64) -> None:
+        """ Single-thread run loop: dispatches until the queue is empty """
+        while self.dispatch_batch(batch_size):
+            pass
+
+    async def run(self, batch_size: int = 64, idle_interval: float = 0.001) -> None:
+        """ asyncio dispatcher: drains a batch, then yields to the other tasks, until `stop()` """
+        self._running = True
+        while self._running:
+            if self.dispatch_batch(batch_size):
+                await asyncio.sleep(0)
+            else:
+                await asyncio.sleep(idle_interval)
+
+    def stop(self) -> None:
+        self._running = False
+
+    def get_queue_depth(self) -> int:
+        return len(self._queue)
+
+    def get_metrics(self) -> Dict[str, float]:
+        _metrics: Dict[str, float] = {
+            'dispatched': self._metrics['dispatched'],
+            'coalesced': self._metrics['coalesced'],
+            'queue_depth': len(self._queue),
+            'max_depth': self._metrics['max_depth'],
+            'max_latency_us': self._metrics['max_latency_ns'] / 1000,
+        }
+        _metrics['mean_latency_us'] = self._metrics['total_latency_ns'] / max(self._metrics['dispatched'], 1) / 1000
+        return _metrics
+
+
+class ConcreteQueuedMediator(QueuedMediator, ConcreteRegistryMediator):
+    """ ConcreteRegistryMediator reactions, dispatched from the queue """
+
+
+class PipeMediator(MediatorInterface):
+    """
+    Mediator seen by a component hosted in its own process: every
+    notification is forwarded to the mediator process over a pipe.
+    """
+
+    def __init__(self, connection: Connection) -> None:
+        self._connection = connection
+
+    def notify(self, sender: object, event: str) -> None:
+        self._connection.send(('event', event))
+
+
+def host_component(component_type: type, connection: Connection) -> None:
+    """ Body of a component process: runs the calls routed by the mediator process """
+    _component: BaseComponent = component_type()
+    _component.set_mediator(PipeMediator(connection))
+    while True:
+        _message: Tuple[str, str] = connection.recv()
+        if _message is None:
+            break
+
+        getattr(_component, _message[1])()
+        sys.stdout.flush()
+        connection.send(('done', _message[1]))
+
+
+class RemoteComponent:
+    """
+    Stands for a component living in its own process. Calling a method on
+    it sends the call over a pipe, like GenericProxy forwards attributes.
+
+    At most `max_in_flight` calls are sent ahead of their completion, the
+    others wait here: a pipe only buffers so much, and a mediator blocked
+    sending to a component which is blocked sending back would deadlock.
+    """
+
+    def __init__(self, component_type: type, max_in_flight: int = 64) -> None:
+        self._component_type = component_type
+        self._max_in_flight = max_in_flight
+        self._in_flight: int = 0
+        self._waiting: Deque[str] = deque()
+        self._connection, _child_connection = multiprocessing.Pipe()
+
+        # don't let the child inherit (and print again) buffered output
+        sys.stdout.flush()
+        self._process = multiprocessing.Process(
+            target=host_component, args=(component_type, _child_connection), daemon=True
+        )
+        self._process.start()
+        _child_connection.close()
+
+    def __getattr__(self, method: str) -> Callable[[], None]:
+        if method.startswith('_'):
+            raise AttributeError(method)
+        return lambda: self.call(method)
+
+    def set_mediator(self, mediator: MediatorInterface) -> None:
+        """ The hosted component already talks to a PipeMediator """
+
+    def call(self, method: str) -> None:
+        self._waiting.append(method)
+        self.send_waiting()
+
+    def done(self) -> None:
+        self._in_flight -= 1
+        self.send_waiting()
+
+    def send_waiting(self) -> None:
+        while self._waiting and self._in_flight < self._max_in_flight:
+            self._connection.send(('call', self._waiting.popleft()))
+            self._in_flight += 1
+
+    def is_busy(self) -> bool:
+        return self._in_flight > 0 or bool(self._waiting)
+
+    def get_component_type(self) -> type:
+        return self._component_type
+
+    def get_connection(self) -> Connection:
+        return self._connection
+
+    def close(self) -> None:
+        self._connection.send(None)
+        self._process.join()
+
+
+class ProcessMediator(RegistryMediator):
+    """
+    Mediator process of components hosted in separate processes. Hosted
+    components notify over pipes, the mediator looks the reactions up as a
+    RegistryMediator does (by component type and event) and reactions call
+    the RemoteComponents, which routes the calls to the right process.
+    """
+
+    def __init__(self, *components: RemoteComponent) -> None:
+        self._remotes: Dict[Connection, RemoteComponent] = {
+            _component.get_connection(): _component for _component in components
+        }
+        self._events: int = 0
+        super().__init__(*components)
+
+    def notify(self, sender: RemoteComponent, event: str) -> None:
+        self._events += 1
+        for _reaction in self.get_reactions(sender.get_component_type(), event):
+            _reaction(sender, 1)
+
+    def run_until_idle(self) -> None:
+        """ Routes events until every routed call has completed """
+        while any(_remote.is_busy() for _remote in self._remotes.values()):
+            for _connection in wait(list(self._remotes)):
+                _kind, _payload = _connection.recv()
+                _remote: RemoteComponent = self._remotes[_connection]
+                if _kind == 'event':
+                    self.notify(_remote, _payload)
+                else:
+                    _remote.done()
+
+    def get_events(self) -> int:
+        return self._events
+
+    def close(self) -> None:
+        for _remote in self._remotes.values():
+            _remote.close()
+
+
+class ConcreteProcessMediator(ProcessMediator, ConcreteRegistryMediator):
+    """ ConcreteRegistryMediator reactions, routed between component processes """
+
 
 class BaseComponent:
     """
@@ -97,6 +516,178 @@ class Demo:
         print("Client triggers operation D.")
         _component2.do_d()
 
+        print('\n', end="")
+
+        print("Same reactions, registered in a RegistryMediator.")
+        _mediator = ConcreteRegistryMediator(_component1, _component2)
+        _component1.do_a()
+
+        print('\n', end="")
+
+        print("Queued mediator: the client returns before any reaction runs.")
+        _queued_mediator = ConcreteQueuedMediator(_component1, _component2)
+        _component2.do_d()
+        print(f"Client is back, {_queued_mediator.get_queue_depth()} event(s) queued.")
+        _queued_mediator.drain()
+        print(_queued_mediator.get_metrics())
+
+        print('\n', end="")
+
+        print("Traced mediator, client triggers operation D.")
+        _buffer = TraceBuffer()
+        _mediator = ConcreteRegistryMediator(_component1, _component2)
+        _mediator.enable_tracing(_buffer)
+        _component2.do_d()
+        for _timestamp, _duration, _depth, _kind, _sender, _event in _buffer.records():
+            print(f"{'  ' * _depth}{_sender} -> {_event} ({_duration} ns)")
+
+        print('\n', end="")
+
+        print("Components in their own processes, client triggers operation D.")
+        _remote1 = RemoteComponent(Component1)
+        _remote2 = RemoteComponent(Component2)
+        _process_mediator = ConcreteProcessMediator(_remote1, _remote2)
+        _remote2.do_d()
+        _process_mediator.run_until_idle()
+        _process_mediator.close()
+
+
+class Benchmark:
+
+    def run(self) -> None:
+        self.dispatch()
+        self.cascade()
+        self.processes()
+        self.coalescing()
+        self.tracing()
+
+    def dispatch(self, events: int = 1000, notifications: int = 100_000) -> None:
+        """ notify() cost with `events` event kinds, if/elif chain against the registry """
+        _names: List[str] = [f'E{i}' for i in range(events)]
+        _counts: List[int] = [0]
+
+        def react(sender: object, count: int) -> None:
+            _counts[0] += 1
+
+        _source: str = 'def notify(self, sender, event):\n' + ''.join(
+            f'    {"if" if i == 0 else "elif"} event == {name!r}:\n        react(sender, 1)\n'
+            for i, name in enumerate(_names)
+        )
+        _namespace: dict = {'react': react}
+        exec(_source, _namespace)
+        IfChainMediator = type('IfChainMediator', (MediatorInterface,), {'notify': _namespace['notify']})
+
+        _registry = RegistryMediator()
+        for _name in _names:
+            _registry.register(Component1, _name, react)
+
+        _random = Random(42)
+        _sender = Component1()
+        _stream: List[str] = [_random.choice(_names) for _ in range(notifications)]
+        for _mediator in (IfChainMediator(), _registry):
+            _seconds: float = timeit(lambda: [_mediator.notify(_sender, _event) for _event in _stream], number=1)
+            print(f'{type(_mediator).__name__:>16}: {_seconds / notifications * 1e9:,.0f} ns per notify '
+                  f'({events} event kinds)')
+
+    def cascade(self, length: int = 100_000) -> None:
+        """
+        A component whose reaction notifies again, `length` times: deeper
+        than the recursion limit for a synchronous mediator, a flat loop for
+        the queued one.
+        """
+        class Relay(BaseComponent):
+            def relay(self, sender: object, count: int) -> None:
+                self.remaining -= 1
+                if self.remaining:
+                    self._mediator.notify(self, 'relay')
+
+        _relay = Relay()
+        _relay.remaining = length
+        _mediator = QueuedMediator(_relay)
+        _mediator.register(Relay, 'relay', _relay.relay)
+
+        async def run() -> None:
+            _dispatcher = asyncio.ensure_future(_mediator.run())
+            _relay._mediator.notify(_relay, 'relay')
+            while _relay.remaining:
+                await asyncio.sleep(0.001)
+            _mediator.stop()
+            await _dispatcher
+
+        asyncio.run(run())
+        _metrics: Dict[str, float] = _mediator.get_metrics()
+        print(f'Cascade of {length} events through the queued mediator: max queue depth {_metrics["max_depth"]}, '
+              f'latency mean {_metrics["mean_latency_us"]:.1f} us, max {_metrics["max_latency_us"]:.1f} us')
+
+    def processes(self, round_trips: int = 2000, burst: int = 1000, bursts: int = 20) -> None:
+        """ Round-trip latency and event throughput of the cross-process mediator """
+        _remote = RemoteComponent(Pinger)
+        _mediator = ProcessMediator(_remote)
+
+        _started: float = perf_counter()
+        for _ in range(round_trips):
+            _remote.ping()
+            _mediator.run_until_idle()
+        _round_trip_us: float = (perf_counter() - _started) / round_trips * 1e6
+
+        _started = perf_counter()
+        for _ in range(bursts):
+            for _ in range(burst):
+                _remote.ping()
+            _mediator.run_until_idle()
+        _events_per_second: float = burst * bursts / (perf_counter() - _started)
+        _mediator.close()
+
+        print(f'Cross-process mediator: round trip {_round_trip_us:.0f} us, {_events_per_second:,.0f} events/s')
+
+    def coalescing(self, bursts: int = 100, burst: int = 1000) -> None:
+        """ Reactions run for bursts of identical notifications, with and without a 1 ms window """
+        for _window in (None, 0.001):
+            _pinger = Pinger()
+            _mediator = QueuedMediator(_pinger, coalesce_window=_window)
+            _reactions: List[int] = [0]
+
+            def react(sender: object, count: int) -> None:
+                _reactions[0] += 1
+
+            _mediator.register(Pinger, 'ping', react)
+
+            for _ in range(bursts):
+                for _ in range(burst):
+                    _pinger.ping()
+                _mediator.drain()
+            print(f'Coalescing window {_window}: {bursts * burst} notifications, {_reactions[0]} reactions')
+
+    def tracing(self, notifications: int = 200_000) -> None:
+        """ notify() cost before, during and after tracing """
+        _pinger = Pinger()
+        _mediator = RegistryMediator(_pinger)
+        _mediator.register(Pinger, 'ping', lambda sender, count: None)
+        _buffer = TraceBuffer()
+
+        for _label in ('untraced', 'traced', 'tracing disabled'):
+            if _label == 'traced':
+                _mediator.enable_tracing(_buffer)
+            elif _label == 'tracing disabled':
+                _mediator.disable_tracing()
+            _seconds: float = timeit(_pinger.ping, number=notifications)
+            print(f'Tracing, {_label:>16}: {_seconds / notifications * 1e9:,.0f} ns per notify')
+
+        with tempfile.TemporaryDirectory() as _directory:
+            _path: str = os.path.join(_directory, 'trace.tsv')
+            _buffer.dump(_path)
+            print(f'Tracing: dumped {len(_buffer)} records, {os.path.getsize(_path):,} bytes')
+
+
+class Pinger(BaseComponent):
+
+    def ping(self) -> None:
+        self._mediator.notify(self, 'ping')
+
 
-demo: Demo = Demo()
-demo.run()
+if __name__ == '__main__':
+    if 'benchmark' in sys.argv[1:]:
+        Benchmark().run()
+    else:
+        demo: Demo = Demo()
+        demo.run()
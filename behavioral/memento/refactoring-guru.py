@@ -7,10 +7,24 @@ The Memento doesn't compromise the internal structure
 of the object it works with, as well as data kept
 inside the snapshots
 """
+import hashlib
+import io
+import lzma
+import mmap
+import os
+import pickle
 import string
 import random
+import struct
+import sys
+import tempfile
+import zlib
+from bisect import bisect_right
+from collections import deque
+from contextlib import redirect_stdout
 from datetime import datetime
-from typing import List
+from timeit import default_timer
+from typing import Any, Deque, Dict, List
 
 
 class MementoInterface:
@@ -44,6 +58,115 @@ class ConcreteMemento(MementoInterface):
 
 
 
+class CompressedMemento(MementoInterface):
+    """
+    Keeps another memento pickled and compressed; the metadata stays readable
+    so showing the history does not decompress anything.
+    """
+    _CODECS: Dict[str, Any] = {'zlib': zlib, 'lzma': lzma}
+
+    def __init__(self, memento: MementoInterface, codec: str = 'zlib') -> None:
+        self._codec = codec
+        self._payload = self._CODECS[codec].compress(pickle.dumps(memento, pickle.HIGHEST_PROTOCOL))
+        self._name = memento.get_name()
+        self._date = memento.get_date()
+
+    def decompress(self) -> MementoInterface:
+        return pickle.loads(self._CODECS[self._codec].decompress(self._payload))
+
+    def get_state(self) -> str:
+        return self.decompress().get_state()
+
+    def get_name(self) -> str:
+        return self._name
+
+    def get_date(self) -> datetime:
+        return self._date
+
+    def get_size(self) -> int:
+        return sys.getsizeof(self) + sys.getsizeof(self._payload) + sys.getsizeof(self._name)
+
+
+class BlobStore:
+    """
+    Content-addressed table of payloads: each distinct payload is kept once
+    under its digest, with a reference count of the mementos that use it.
+    """
+    def __init__(self) -> None:
+        self._blobs: Dict[bytes, bytes] = {}
+        self._references: Dict[bytes, int] = {}
+        self._stored = 0
+
+    def put(self, payload: bytes) -> bytes:
+        _digest: bytes = hashlib.blake2b(payload, digest_size=20).digest()
+        if _digest in self._references:
+            self._references[_digest] += 1
+        else:
+            self._blobs[_digest] = payload
+            self._references[_digest] = 1
+            self._stored += len(payload)
+        return _digest
+
+    def get(self, digest: bytes) -> bytes:
+        return self._blobs[digest]
+
+    def release(self, digest: bytes) -> None:
+        self._references[digest] -= 1
+        if not self._references[digest]:
+            del self._references[digest]
+            self._stored -= len(self._blobs.pop(digest))
+
+    def get_size(self) -> int:
+        """ approximate bytes held: payloads, their digests and both tables """
+        return (sys.getsizeof(self._blobs) + sys.getsizeof(self._references)
+                + sum(sys.getsizeof(_digest) + sys.getsizeof(_blob) for _digest, _blob in self._blobs.items()))
+
+    def get_metrics(self) -> Dict[str, int]:
+        return {
+            'blobs': len(self._blobs),
+            'references': sum(self._references.values()),
+            'bytes': self._stored,
+        }
+
+
+class DigestMemento(MementoInterface):
+    """
+    Keeps only the digest of another memento's state in a BlobStore, plus
+    its metadata; identical states share one stored payload.
+    """
+    def __init__(self, memento: MementoInterface, store: BlobStore) -> None:
+        self._store = store
+        self._digest = store.put(pickle.dumps(memento.get_state(), pickle.HIGHEST_PROTOCOL))
+        self._name = memento.get_name()
+        self._date = memento.get_date()
+
+    def get_state(self) -> str:
+        return pickle.loads(self._store.get(self._digest))
+
+    def get_digest(self) -> bytes:
+        return self._digest
+
+    def get_name(self) -> str:
+        return self._name
+
+    def get_date(self) -> datetime:
+        return self._date
+
+    def get_size(self) -> int:
+        """ bytes held by this memento alone; the payload is counted by the store """
+        return sys.getsizeof(self) + sys.getsizeof(self._digest) + sys.getsizeof(self._name)
+
+
+def get_memento_size(memento: MementoInterface) -> int:
+    """ approximate bytes held by a memento: the object, its dict and its direct values """
+    if isinstance(memento, (CompressedMemento, DigestMemento)):
+        return memento.get_size()
+    _attributes: dict = vars(memento)
+    return sys.getsizeof(memento) + sys.getsizeof(_attributes) + sum(
+        sys.getsizeof(_value) for _value in _attributes.values()
+    )
+
+
 class Originator:
     """
     The Originator holds some important state that may change over time.
@@ -103,6 +226,270 @@ class Caretaker:
             print(_memento.get_name())
 
 
+class CompressingCaretaker(Caretaker):
+    """
+    Caretaker with a memory budget: only the `keep_recent` newest mementos stay
+    as they are, older ones are compressed and decompressed only when `undo`
+    reaches them, and the oldest are dropped once the budget is exceeded.
+    """
+    def __init__(self, originator: Originator, budget: int = 1 << 20,
+                 keep_recent: int = 8, codec: str = 'zlib') -> None:
+        super().__init__(originator)
+        if codec not in CompressedMemento._CODECS:
+            raise ValueError(f'unknown codec: {codec}')
+        self._mementos: Deque[MementoInterface] = deque()
+        self._sizes: Deque[int] = deque()
+        self._budget = budget
+        self._keep_recent = keep_recent
+        self._codec = codec
+        self._used = 0
+        self._compressed = 0
+        self._evicted = 0
+
+    def backup(self) -> None:
+        print("Caretaker: Saving Originator's state...")
+        self._push(self._originator.save())
+
+        if len(self._mementos) > self._keep_recent:
+            _index: int = len(self._mementos) - self._keep_recent - 1
+            _memento: MementoInterface = self._mementos[_index]
+            if not isinstance(_memento, CompressedMemento):
+                self._replace(_index, CompressedMemento(_memento, self._codec))
+                self._compressed += 1
+
+        while self._used > self._budget and len(self._mementos) > 1:
+            self._mementos.popleft()
+            self._used -= self._sizes.popleft()
+            self._evicted += 1
+
+    def undo(self) -> None:
+        if not self._mementos:
+            return
+
+        _memento = self._mementos.pop()
+        self._used -= self._sizes.pop()
+        print(f"Caretaker: Restoring state to: {_memento.get_name()}")
+
+        if isinstance(_memento, CompressedMemento):
+            _memento = _memento.decompress()
+        self._originator.restore(_memento)
+
+    def _push(self, memento: MementoInterface) -> None:
+        _size: int = get_memento_size(memento)
+        self._mementos.append(memento)
+        self._sizes.append(_size)
+        self._used += _size
+
+    def _replace(self, index: int, memento: MementoInterface) -> None:
+        _size: int = get_memento_size(memento)
+        self._used += _size - self._sizes[index]
+        self._mementos[index] = memento
+        self._sizes[index] = _size
+
+    def get_memory_usage(self) -> int:
+        return self._used
+
+    def get_metrics(self) -> Dict[str, int]:
+        return {
+            'mementos': len(self._mementos),
+            'bytes': self._used,
+            'budget': self._budget,
+            'compressed': self._compressed,
+            'evicted': self._evicted,
+        }
+
+    def report(self) -> None:
+        _metrics: Dict[str, int] = self.get_metrics()
+        print(f"Caretaker: {_metrics['mementos']} mementos in {_metrics['bytes']:,} of "
+              f"{_metrics['budget']:,} bytes ({_metrics['compressed']} compressed, "
+              f"{_metrics['evicted']} evicted)")
+
+
+class FileCaretaker(Caretaker):
+    """
+    Caretaker which appends pickled mementos to a file, with a sidecar `.idx`
+    file of fixed-size (timestamp in microseconds, end offset) records. The
+    history survives the process, and `restore_at` finds a memento by date
+    with a binary search over the mmap'd index, reading only that memento.
+    A memento is indexed only once its data is written, so a crash mid-backup
+    leaves a tail past the last record, which is trimmed on open.
+    """
+    _RECORD: struct.Struct = struct.Struct('<qQ')
+
+    def __init__(self, originator: Originator, path: str) -> None:
+        super().__init__(originator)
+        self._path = path
+        self._data = open(path, 'a+b')
+        self._index = open(path + '.idx', 'a+b')
+        self._data_map: mmap.mmap = None
+        self._index_map: mmap.mmap = None
+        self._count = self._index.tell() // self._RECORD.size
+        self._truncate(self._count)
+
+    def backup(self) -> None:
+        print("Caretaker: Saving Originator's state...")
+        _memento: MementoInterface = self._originator.save()
+        # keys must not go backwards for the binary search, even if the clock does
+        _key: int = max(self._to_key(_memento.get_date()), self._last_key)
+
+        self._data.write(pickle.dumps(_memento, pickle.HIGHEST_PROTOCOL))
+        self._data.flush()
+        self._index.write(self._RECORD.pack(_key, self._data.tell()))
+        self._index.flush()
+        self._count += 1
+        self._last_key = _key
+
+    def undo(self) -> None:
+        if not self._count:
+            return
+
+        _memento: MementoInterface = self.get_memento(self._count - 1)
+        print(f"Caretaker: Restoring state to: {_memento.get_name()}")
+
+        self._truncate(self._count - 1)
+        self._originator.restore(_memento)
+
+    def restore_at(self, when: datetime) -> None:
+        """ Restores the newest memento saved at or before `when`. """
+        _memento: MementoInterface = self.get_memento_at(when)
+        print(f"Caretaker: Restoring state to: {_memento.get_name()}")
+        self._originator.restore(_memento)
+
+    def get_memento_at(self, when: datetime) -> MementoInterface:
+        _position: int = bisect_right(_IndexKeys(self), self._to_key(when)) - 1
+        if _position < 0:
+            raise ValueError(f'no memento saved at or before {when}')
+        return self.get_memento(_position)
+
+    def get_memento(self, position: int) -> MementoInterface:
+        _start: int = self._get_end(position - 1) if position else 0
+        _stop: int = self._get_end(position)
+        return pickle.loads(self._map_data()[_start:_stop])
+
+    def get_count(self) -> int:
+        return self._count
+
+    def show_history(self) -> None:
+        print("Caretaker: Here's the list of mementos:")
+        for _position in range(self._count):
+            print(self.get_memento(_position).get_name())
+
+    def close(self) -> None:
+        self._unmap()
+        self._data.close()
+        self._index.close()
+
+    def _get_key(self, position: int) -> int:
+        return self._RECORD.unpack_from(self._map_index(), position * self._RECORD.size)[0]
+
+    def _get_end(self, position: int) -> int:
+        return self._RECORD.unpack_from(self._map_index(), position * self._RECORD.size)[1]
+
+    def _map_index(self) -> mmap.mmap:
+        _size: int = self._count * self._RECORD.size
+        if self._index_map is None or len(self._index_map) < _size:
+            self._index_map = self._map(self._index, self._index_map)
+        return self._index_map
+
+    def _map_data(self) -> mmap.mmap:
+        if self._data_map is None or len(self._data_map) < self._data.tell():
+            self._data_map = self._map(self._data, self._data_map)
+        return self._data_map
+
+    @staticmethod
+    def _map(file: Any, old: mmap.mmap) -> mmap.mmap:
+        # appends outgrow a mapping, so it is replaced when a read goes past its end
+        if old is not None:
+            old.close()
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _unmap(self) -> None:
+        for _map in (self._data_map, self._index_map):
+            if _map is not None:
+                _map.close()
+        self._data_map = self._index_map = None
+
+    def _truncate(self, count: int) -> None:
+        self._count = count
+        _end: int = self._get_end(count - 1) if count else 0
+        self._last_key = self._get_key(count - 1) if count else -1 << 63
+        self._unmap()
+        self._data.truncate(_end)
+        self._index.truncate(count * self._RECORD.size)
+        self._data.seek(0, os.SEEK_END)
+        self._index.seek(0, os.SEEK_END)
+
+    @staticmethod
+    def _to_key(when: datetime) -> int:
+        return round(when.timestamp() * 1_000_000)
+
+
+class _IndexKeys:
+    """ Sequence view over a FileCaretaker's index timestamps, for bisect. """
+
+    def __init__(self, caretaker: FileCaretaker) -> None:
+        self._caretaker = caretaker
+
+    def __len__(self) -> int:
+        return self._caretaker.get_count()
+
+    def __getitem__(self, position: int) -> int:
+        return self._caretaker._get_key(position)
+
+
+class DedupCaretaker(Caretaker):
+    """
+    Caretaker which stores each distinct state once: mementos become
+    DigestMementos over a shared BlobStore, and a payload is freed when
+    the last memento that uses it is undone.
+    """
+    def __init__(self, originator: Originator, store: BlobStore = None) -> None:
+        super().__init__(originator)
+        self._store = store if store is not None else BlobStore()
+
+    def backup(self) -> None:
+        print("Caretaker: Saving Originator's state...")
+        self._mementos.append(DigestMemento(self._originator.save(), self._store))
+
+    def undo(self) -> None:
+        if not self._mementos:
+            return
+
+        _memento = self._mementos.pop()
+        print(f"Caretaker: Restoring state to: {_memento.get_name()}")
+
+        self._originator.restore(_memento)
+        self._store.release(_memento.get_digest())
+
+    def get_memory_usage(self) -> int:
+        return self._store.get_size() + sum(get_memento_size(_memento) for _memento in self._mementos)
+
+    def report(self) -> None:
+        _metrics: Dict[str, int] = self._store.get_metrics()
+        print(f"Caretaker: {len(self._mementos)} mementos share {_metrics['blobs']} states, "
+              f"{self.get_memory_usage():,} bytes")
+
+
+class TextOriginator(Originator):
+    """ Originator whose state is a whole text; each change rewrites one line. """
+    _WORDS: List[str] = ['memento', 'state', 'caretaker', 'originator', 'undo', 'history', 'snapshot', 'the']
+
+    def __init__(self, lines: int = 200) -> None:
+        self._lines: List[str] = [self.generate_line() for _ in range(lines)]
+        super().__init__('\n'.join(self._lines))
+
+    def generate_line(self) -> str:
+        return ' '.join(random.choices(self._WORDS, k=8))
+
+    def do_something(self) -> None:
+        self._lines[random.randrange(len(self._lines))] = self.generate_line()
+        self._state = '\n'.join(self._lines)
+
+    def restore(self, memento: MementoInterface) -> None:
+        super().restore(memento)
+        self._lines = self._state.split('\n')
+
+
 class Demo:
 
     def run(self) -> None:
@@ -128,5 +515,90 @@ class Demo:
         caretaker.undo()
 
 
-demo: Demo = Demo()
-demo.run()
+class Benchmark:
+
+    def run(self) -> None:
+        self.compression()
+        self.time_index()
+        self.deduplication()
+
+    def compression(self, backups: int = 5000, budget: int = 1 << 20) -> None:
+        """ memory held by a plain and a budgeted caretaker after many backups of a ~11KB text """
+        for _codec in (None, 'zlib', 'lzma'):
+            random.seed(0)
+            with redirect_stdout(io.StringIO()):
+                _originator: Originator = TextOriginator()
+                _caretaker: Caretaker = (
+                    Caretaker(_originator) if _codec is None
+                    else CompressingCaretaker(_originator, budget=budget, codec=_codec)
+                )
+                _start: float = default_timer()
+                for _ in range(backups):
+                    _caretaker.backup()
+                    _originator.do_something()
+                _elapsed: float = default_timer() - _start
+
+                _undo_start: float = default_timer()
+                for _ in range(100):
+                    _caretaker.undo()
+                _undo: float = default_timer() - _undo_start
+
+            _used: int = sum(get_memento_size(_memento) for _memento in _caretaker._mementos)
+            print(f'{_codec or "uncompressed":>12}: {len(_caretaker._mementos):,} mementos kept in {_used:,} bytes, '
+                  f'{_elapsed / backups * 1e6:,.0f} us per backup, {_undo / 100 * 1e6:,.0f} us per undo')
+
+
+    def time_index(self, backups: int = 200_000, restores: int = 10_000) -> None:
+        """ restore_at latency over a long on-disk history """
+        with tempfile.TemporaryDirectory() as _directory, redirect_stdout(io.StringIO()):
+            _originator: Originator = Originator('initial')
+            _caretaker: FileCaretaker = FileCaretaker(_originator, os.path.join(_directory, 'history'))
+            _start: float = default_timer()
+            for _ in range(backups):
+                _caretaker.backup()
+                _originator.do_something()
+            _elapsed: float = default_timer() - _start
+
+            _first: float = _caretaker.get_memento(0).get_date().timestamp()
+            _last: float = _caretaker.get_memento(backups - 1).get_date().timestamp()
+            _times: List[datetime] = [
+                datetime.fromtimestamp(random.uniform(_first, _last)) for _ in range(restores)
+            ]
+            _restore_start: float = default_timer()
+            for _when in _times:
+                _caretaker.restore_at(_when)
+            _restore: float = default_timer() - _restore_start
+            _size: int = os.path.getsize(_caretaker._path) + os.path.getsize(_caretaker._path + '.idx')
+            _caretaker.close()
+
+        print(f'Time index: {backups:,} mementos on disk ({_size:,} bytes), '
+              f'{_elapsed / backups * 1e6:,.1f} us per backup, {_restore / restores * 1e6:,.1f} us per restore_at')
+
+
+    def deduplication(self, backups: int = 2000) -> None:
+        """ memory of a plain and a deduplicating caretaker as more backups repeat the previous state """
+        for _duplicates in (0.0, 0.5, 0.9):
+            _used: Dict[str, int] = {}
+            for _caretaker_type in (Caretaker, DedupCaretaker):
+                random.seed(0)
+                with redirect_stdout(io.StringIO()):
+                    _originator: Originator = TextOriginator()
+                    _caretaker: Caretaker = _caretaker_type(_originator)
+                    for _ in range(backups):
+                        _caretaker.backup()
+                        if random.random() >= _duplicates:
+                            _originator.do_something()
+                _used[_caretaker_type.__name__] = (
+                    _caretaker.get_memory_usage() if isinstance(_caretaker, DedupCaretaker)
+                    else sum(get_memento_size(_memento) for _memento in _caretaker._mementos)
+                )
+            print(f'Deduplication, {_duplicates:.0%} repeated: {_used["Caretaker"]:,} bytes plain, '
+                  f'{_used["DedupCaretaker"]:,} bytes deduplicated')
+
+
+if __name__ == '__main__':
+    if 'benchmark' in sys.argv[1:]:
+        Benchmark().run()
+    else:
+        demo: Demo = Demo()
+        demo.run()
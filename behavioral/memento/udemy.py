@@ -4,18 +4,234 @@ so that the object can be returned to this state
 later.
 """
 import copy
-from typing import List
+import sys
+from timeit import timeit
+from typing import Any, Iterable, Iterator, List, Set
+
+
+class PersistentVector:
+    """
+    Immutable vector stored as a 32-way trie of tuples. `append` and `set`
+    return a new vector which shares every node but one root-to-leaf path
+    with the old one, so they cost O(log32 n) and old versions stay cheap.
+    """
+    __slots__ = ('_size', '_shift', '_root')
+
+    _BITS: int = 5
+    _MASK: int = (1 << _BITS) - 1
+
+    def __init__(self, size: int = 0, shift: int = _BITS, root: tuple = ()) -> None:
+        self._size = size
+        self._shift = shift
+        self._root = root
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, index: int) -> Any:
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError('vector index out of range')
+
+        _node: tuple = self._root
+        for _level in range(self._shift, 0, -self._BITS):
+            _node = _node[(index >> _level) & self._MASK]
+        return _node[index & self._MASK]
+
+    def __iter__(self) -> Iterator[Any]:
+        return self._leaves(self._root, self._shift)
+
+    def append(self, value: Any) -> 'PersistentVector':
+        if self._size == 1 << (self._shift + self._BITS):
+            _root: tuple = (self._root, self._new_path(self._shift, value))
+            return PersistentVector(self._size + 1, self._shift + self._BITS, _root)
+        return PersistentVector(self._size + 1, self._shift, self._push(self._root, self._shift, value))
+
+    def set(self, index: int, value: Any) -> 'PersistentVector':
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError('vector index out of range')
+        return PersistentVector(self._size, self._shift, self._assoc(self._root, self._shift, index, value))
+
+    def _push(self, node: tuple, level: int, value: Any) -> tuple:
+        if level == 0:
+            return node + (value,)
+
+        _child: int = (self._size >> level) & self._MASK
+        if _child < len(node):
+            return node[:_child] + (self._push(node[_child], level - self._BITS, value),)
+        return node + (self._new_path(level - self._BITS, value),)
+
+    def _new_path(self, level: int, value: Any) -> tuple:
+        _node: tuple = (value,)
+        for _ in range(0, level, self._BITS):
+            _node = (_node,)
+        return _node
+
+    def _assoc(self, node: tuple, level: int, index: int, value: Any) -> tuple:
+        _child: int = (index >> level) & self._MASK
+        if level == 0:
+            return node[:_child] + (value,) + node[_child + 1:]
+        return node[:_child] + (self._assoc(node[_child], level - self._BITS, index, value),) + node[_child + 1:]
+
+    def _leaves(self, node: tuple, level: int) -> Iterator[Any]:
+        if level == 0:
+            yield from node
+        else:
+            for _child in node:
+                yield from self._leaves(_child, level - self._BITS)
+
+
+class PersistentList:
+    """
+    Mutable, list-like facade over a PersistentVector: every mutation
+    swaps in a new vector, so `snapshot()` just returns the current one.
+    """
+
+    def __init__(self, items: Iterable[Any] = ()) -> None:
+        self._vector = PersistentVector()
+        for item in items:
+            self.append(item)
+
+    def append(self, value: Any) -> None:
+        self._vector = self._vector.append(value)
+
+    def __setitem__(self, index: int, value: Any) -> None:
+        self._vector = self._vector.set(index, value)
+
+    def __getitem__(self, index: int) -> Any:
+        return self._vector[index]
+
+    def __len__(self) -> int:
+        return len(self._vector)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._vector)
+
+    def __repr__(self) -> str:
+        return repr(list(self._vector))
+
+    def snapshot(self) -> PersistentVector:
+        return self._vector
+
+    def restore(self, snapshot: PersistentVector) -> None:
+        self._vector = snapshot
+
+
+# recorded in a memento for an attribute deleted since the previous save
+_DELETED: object = object()
 
 
 class Memento:
 
-    def __init__(self, data) -> None:
-        """ make a deep copy of every variable in the given class. """
-        for attribute in vars(data):
-            setattr(self, attribute, copy.deepcopy(getattr(data, attribute)))
+    def __init__(self, data, attributes: Iterable[str] = None) -> None:
+        """
+        make a deep copy of every variable in the given class (or only of
+        the given attributes), except for values which can be shared:
+        other mementos (immutable) and persistent containers (snapshot in
+        O(1)).
+        """
+        for attribute in vars(data) if attributes is None else attributes:
+            setattr(self, attribute, self.save_value(getattr(data, attribute, _DELETED)))
+
+    @staticmethod
+    def save_value(value: Any) -> Any:
+        if value is _DELETED or isinstance(value, Memento):
+            return value
+        if isinstance(value, PersistentList):
+            return value.snapshot()
+        return copy.deepcopy(value)
+
+    def lookup(self, attribute: str) -> Any:
+        """ value of an attribute at this save, from the newest memento which recorded it """
+        _memento: Memento = self
+        while _memento is not None:
+            _recorded: dict = vars(_memento)
+            if attribute in _recorded:
+                if _recorded[attribute] is _DELETED:
+                    break
+                return _recorded[attribute]
+            _memento = _recorded.get('_last')
+        raise AttributeError(attribute)
+
+
+class Tracked:
+    """
+    Mixin for containers which mark every attribute holding them dirty on
+    its owner when mutated in place: a container assigned to several
+    attributes (or objects) is watched under each of them.
+    """
+
+    def watch(self, owner: 'Undoable', name: str) -> None:
+        _watchers: List[tuple] = self.__dict__.setdefault('_watchers', [])
+        if not any(_owner is owner and _name == name for _owner, _name in _watchers):
+            _watchers.append((owner, name))
+
+    def _changed(self) -> None:
+        for _owner, _name in self.__dict__.get('_watchers', ()):
+            _owner.touch(_name)
+
+
+class TrackedList(Tracked, list):
+    """ list which marks its attributes dirty on their owners when mutated in place """
+
+    def __init__(self, items: Iterable[Any], owner: 'Undoable', name: str) -> None:
+        super().__init__(items)
+        self.watch(owner, name)
+
+    def __deepcopy__(self, memo: dict) -> list:
+        return copy.deepcopy(list(self), memo)
+
+    def __reduce__(self) -> tuple:
+        return list, (list(self),)
+
+
+class TrackedDict(Tracked, dict):
+    """ dict which marks its attributes dirty on their owners when mutated in place """
+
+    def __init__(self, items: Any, owner: 'Undoable', name: str) -> None:
+        super().__init__(items)
+        self.watch(owner, name)
+
+    def __deepcopy__(self, memo: dict) -> dict:
+        return copy.deepcopy(dict(self), memo)
+
+    def __reduce__(self) -> tuple:
+        return dict, (dict(self),)
+
+
+def _mutator(container: type, method: str) -> Any:
+    _original: Any = getattr(container, method)
+
+    def mutate(self, *args: Any, **kwargs: Any) -> Any:
+        self._changed()
+        return _original(self, *args, **kwargs)
+
+    mutate.__name__ = method
+    return mutate
+
+
+for _method in ('append', 'extend', 'insert', 'pop', 'remove', 'clear', 'sort', 'reverse',
+                '__setitem__', '__delitem__', '__iadd__', '__imul__'):
+    setattr(TrackedList, _method, _mutator(list, _method))
+
+for _method in ('pop', 'popitem', 'clear', 'update', 'setdefault', '__setitem__', '__delitem__'):
+    setattr(TrackedDict, _method, _mutator(dict, _method))
 
 
 class Undoable:
+    """
+    Tracks which attributes changed since the last save: assignments are
+    seen through __setattr__, and lists and dicts are wrapped so in-place
+    changes are seen too. A save records only the changed attributes and
+    an undo restores only those. Changes deeper than the top-level list
+    or dict are not seen; call `touch(name)` after them. The first save
+    records every attribute.
+    """
+
+    _IMMUTABLE: tuple = (type(None), bool, int, float, complex, str, bytes, tuple, frozenset)
 
     def __init__(self) -> None:
         """
@@ -24,12 +240,73 @@ class Undoable:
         """
         self._last: Memento = None
 
+    def __getattr__(self, name: str) -> Any:
+        # created on first use, so subclasses may assign before calling __init__
+        if name == '_dirty':
+            _dirty: Set[str] = set()
+            object.__setattr__(self, '_dirty', _dirty)
+            return _dirty
+        raise AttributeError(name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name != '_last':
+            if type(value) is list:
+                value = TrackedList(value, self, name)
+            elif type(value) is dict:
+                value = TrackedDict(value, self, name)
+            elif isinstance(value, Tracked):
+                value.watch(self, name)
+            self._dirty.add(name)
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name: str) -> None:
+        self._dirty.add(name)
+        object.__delattr__(self, name)
+
+    def touch(self, name: str) -> None:
+        self._dirty.add(name)
+
+    def get_dirty(self) -> Set[str]:
+        """ attributes which a save has to record """
+        _dirty: Set[str] = set(self._dirty)
+        for _name, _value in vars(self).items():
+            # other objects may change in place without us seeing it
+            if self._last is None or not isinstance(_value, self._IMMUTABLE + (Tracked, Memento)):
+                _dirty.add(_name)
+        _dirty.difference_update(('_dirty', '_last'))
+        return _dirty
+
     def save(self) -> None:
-        self._last = Memento(self)
+        self._last = Memento(self, list(self.get_dirty()) + ['_last'])
+        self._dirty.clear()
 
     def undo(self) -> None:
-        for attibute in vars(self):
-            setattr(self, attibute, copy.deepcopy(getattr(self._last, attibute)))
+        if self._last is None or self._last._last is None:
+            # no earlier save to go back to
+            return
+
+        _changed: Set[str] = set(vars(self._last)) | self.get_dirty()
+        _changed.discard('_last')
+        _target: Memento = self._last._last
+        self._last = _target
+        for attibute in _changed:
+            try:
+                _saved: Any = _target.lookup(attibute)
+            except AttributeError:
+                # the attribute did not exist (yet, or any more) at that save
+                if hasattr(self, attibute):
+                    delattr(self, attibute)
+                continue
+            if isinstance(_saved, PersistentVector):
+                # the attribute may have been reassigned since: restore into a list again
+                _current: Any = getattr(self, attibute, None)
+                if not isinstance(_current, PersistentList):
+                    _current = PersistentList()
+                    setattr(self, attibute, _current)
+                _current.restore(_saved)
+            else:
+                setattr(self, attibute, copy.deepcopy(_saved))
+        self._dirty.clear()
 
 
 class Data(Undoable):
@@ -39,17 +316,81 @@ class Data(Undoable):
         self.numbers: List[int] = []
 
 
-data: Undoable = Data()
+class PersistentData(Undoable):
+    """ snapshot mode: saving numbers shares structure instead of copying """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.numbers: PersistentList = PersistentList()
+
+
+class Document(Undoable):
+    """ twenty large sections which rarely change and a small cursor which often does """
+
+    def __init__(self) -> None:
+        super().__init__()
+        for field in range(20):
+            setattr(self, f'section_{field}', list(range(10_000)))
+        self.cursor: int = 0
+
+
+class Benchmark:
+
+    def run(self) -> None:
+        self.snapshots()
+        self.incremental_saves()
+
+    def snapshots(self, size: int = 100_000) -> None:
+        """ cost of a save with `size` numbers, deep copy against snapshot mode """
+        for _data in (Data(), PersistentData()):
+            for _number in range(size):
+                _data.numbers.append(_number)
+
+            def change_and_save() -> None:
+                # an unchanged list would not be saved again at all
+                _data.numbers.append(size)
+                _data.save()
+
+            print(f'{type(_data).__name__}: {timeit(change_and_save, number=10) / 10 * 1e6:,.0f} us per save')
+
+
+    def incremental_saves(self) -> None:
+        """ cost of a save when only the cursor changed, full copy against dirty attributes only """
+        _document: Document = Document()
+        _document.save()
+        _document.cursor = 1
+        print(f'full save: {timeit(lambda: Memento(_document), number=10) / 10 * 1e6:,.0f} us, '
+              f'incremental save: {timeit(_document.save, number=10) / 10 * 1e6:,.0f} us')
+
+
+if __name__ == '__main__':
+    if 'benchmark' in sys.argv[1:]:
+        Benchmark().run()
+    else:
+        data: Undoable = Data()
+
+        # foward
+        for i in range(10):
+            data.save()
+            data.numbers.append(i)
+
+        data.save()
+        print(data.numbers)
+
+        #backward
+        for i in range(10):
+            data.undo()
+            print(data.numbers)
 
-# foward
-for i in range(10):
-    data.save()
-    data.numbers.append(i)
+        # same history in snapshot mode
+        data = PersistentData()
+        for i in range(10):
+            data.save()
+            data.numbers.append(i)
 
-data.save()
-print(data.numbers)
+        data.save()
+        print(data.numbers)
 
-#backward
-for i in range(10):
-    data.undo()
-    print(data.numbers)
+        for i in range(10):
+            data.undo()
+            print(data.numbers)